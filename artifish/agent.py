@@ -6,15 +6,15 @@ with a distinct personality and capabilities.
 """
 
 import os
+import re
 import asyncio
 import logging
 from typing import AsyncGenerator, Optional
+from cachetools import TTLCache
 from dotenv import load_dotenv
 from google.adk import Agent
 from google.adk.events.event import Event
 from google.adk.agents.invocation_context import InvocationContext
-from pydantic import BaseModel
-from artifish.tools.network_crawler import NetworkCrawlerService
 
 # Set up logging
 logging.basicConfig(level=logging.INFO)
@@ -23,9 +23,14 @@ logger = logging.getLogger(__name__)
 # Load environment variables
 load_dotenv()
 
+# Patterns for recognising crawl requests and Bluesky handles in messages
+_CRAWL_REQUEST_RE = re.compile(r"crawl.*bluesky|bluesky.*crawl", re.I | re.S)
+_HANDLE_RE = re.compile(r"\b([a-z0-9][a-z0-9-]*(?:\.[a-z0-9][a-z0-9-]*)+)\b", re.I)
 
-class MessageContent(BaseModel):
-    content: str
+# Reply for messages that aren't crawl requests
+_DEFAULT_GREETING = ("Hello! I'm Boss-C, your Bluesky network crawler. "
+                     "You can ask me to crawl a Bluesky profile to analyze "
+                     "their network. Just say something like 'crawl bluesky.bsky.social'.")
 
 
 class BossCAgent(Agent):
@@ -42,9 +47,14 @@ class BossCAgent(Agent):
         import os
         os.environ["LITELLM_MODEL"] = f"ollama/{model_name}"
         
-        # Create the network crawler service before initialization
+        # Create the network crawler service before initialization; imported
+        # here so the crawler's HTTP and database SDKs load only when needed
+        from artifish.tools.network_crawler import NetworkCrawlerService
         self._network_crawler_service = NetworkCrawlerService()
         
+        # Recent crawl results keyed by lowercased handle
+        self._crawl_cache = TTLCache(maxsize=1024, ttl=300)
+        
         # Initialize the agent
         super().__init__(
             name="boss_c",
@@ -78,21 +88,25 @@ class BossCAgent(Agent):
         message_content = ctx.user_request.text
         
         # Basic message handling logic
-        if "crawl" in message_content.lower() and "bluesky" in message_content.lower():
+        if _CRAWL_REQUEST_RE.search(message_content):
             # Extract handle from message if possible
-            words = message_content.split()
-            handle = None
-            
-            for word in words:
-                if "." in word and not word.startswith(("http://", "https://")):
-                    handle = word.strip(",.?!;:")
-                    break
+            match = _HANDLE_RE.search(message_content)
+            handle = match.group(1) if match else None
             
             if handle:
-                # Use the tool directly
+                # Use the tool directly, streaming progress as it happens
                 try:
-                    result = await self._network_crawler_service.crawl(handle)
-                    response = f"Successfully crawled the network for {handle}!\n\nFound {result.get('accounts_found', 0)} accounts and {result.get('follows_found', 0)} follow relationships."
+                    result = {}
+                    async for progress in self._crawl_progress(handle):
+                        if progress.get("stage") in ("done", "error"):
+                            result = progress
+                        else:
+                            yield Event.create_content_event(_format_progress(progress))
+                    
+                    if "error" in result:
+                        response = f"Sorry, I encountered an error while trying to crawl {handle}: {result['error']}"
+                    else:
+                        response = f"Successfully crawled the network for {handle}!\n\nFound {result.get('accounts_found', 0)} accounts and {result.get('follows_found', 0)} follow relationships."
                 except Exception as e:
                     logger.error(f"Error in crawl request: {e}")
                     response = f"Sorry, I encountered an error while trying to crawl {handle}: {str(e)}"
@@ -100,13 +114,60 @@ class BossCAgent(Agent):
                 response = "I need a Bluesky handle to crawl. Please provide one."
         else:
             # Default response for other messages
-            response = ("Hello! I'm Boss-C, your Bluesky network crawler. "
-                      "You can ask me to crawl a Bluesky profile to analyze "
-                      "their network. Just say something like 'crawl bluesky.bsky.social'.")
+            response = _DEFAULT_GREETING
         
         # Create an event with the response
         event = Event.create_content_event(response)
         yield event
+    
+    async def _crawl_progress(self, handle: str) -> AsyncGenerator[dict, None]:
+        """
+        Crawl a handle, reusing a recent result if the account is unchanged.
+        
+        A cached result is only reused when a cheap profile lookup shows the
+        same follower and follow counts as when it was crawled.
+        
+        Args:
+            handle (str): The Bluesky handle to crawl
+            
+        Yields:
+            dict: Crawl progress, ending with a ``done`` or ``error`` stage
+        """
+        key = handle.lower()
+        cached = self._crawl_cache.get(key)
+        
+        if cached is not None:
+            counts = await self._network_crawler_service.get_profile_counts(handle)
+            if counts is not None and counts == (cached.get("followers_count"), cached.get("follows_count")):
+                logger.info(f"Reusing cached crawl for {handle}")
+                yield cached
+                return
+        
+        async for progress in self._network_crawler_service.crawl_progress(handle):
+            if progress.get("stage") == "done":
+                self._crawl_cache[key] = progress
+            yield progress
+    
+    async def aclose(self):
+        """Close the HTTP sessions held by the network crawler."""
+        await self._network_crawler_service.aclose()
+
+
+def _format_progress(progress: dict) -> str:
+    """
+    Describe an intermediate crawl progress update for the user.
+    
+    Args:
+        progress (dict): A progress dict yielded by the crawler
+        
+    Returns:
+        str: A short human-readable status line
+    """
+    if progress["stage"] == "resolved":
+        return f"Resolved {progress['handle']} to {progress['did']}, fetching their network..."
+    
+    return (f"Stored {progress['follows']} follows and {progress['followers']} followers "
+            f"for {progress['handle']}.")
 
 
 async def run_agent():
@@ -119,40 +180,46 @@ async def run_agent():
     print("Type 'exit' or 'quit' to end the session.")
     print("Example: 'crawl bluesky.bsky.social'")
     
-    while True:
-        try:
-            user_input = input("\n> ")
-            if user_input.lower() in ["exit", "quit"]:
-                break
+    try:
+        while True:
+            try:
+                user_input = input("\n> ")
+                if user_input.lower() in ["exit", "quit"]:
+                    break
+                    
+                # Create a simple invocation context with the user's input
+                from google.adk.agents.invocation_context import InvocationContext
+                from google.adk.agents.user_request import UserRequest
                 
-            # Create a simple invocation context with the user's input
-            from google.adk.agents.invocation_context import InvocationContext
-            from google.adk.agents.user_request import UserRequest
-            
-            ctx = InvocationContext(
-                user_request=UserRequest(text=user_input),
-                session_state={}
-            )
-            
-            # Process the user input
-            response_text = ""
-            async for event in agent._run_async_impl(ctx):
-                if event.content:
-                    response_text = "".join([part.text for part in event.content.parts if part.text])
-            
-            # Print the response
-            print(response_text)
-            
-        except KeyboardInterrupt:
-            print("\nExiting...")
-            break
-        except Exception as e:
-            logger.error(f"Error: {e}")
-            print(f"An error occurred: {e}")
+                ctx = InvocationContext(
+                    user_request=UserRequest(text=user_input),
+                    session_state={}
+                )
+                
+                # Process the user input, printing each event as it arrives
+                async for event in agent._run_async_impl(ctx):
+                    if event.content:
+                        print("".join([part.text for part in event.content.parts if part.text]))
+                
+            except KeyboardInterrupt:
+                print("\nExiting...")
+                break
+            except Exception as e:
+                logger.error(f"Error: {e}")
+                print(f"An error occurred: {e}")
+    finally:
+        await agent.aclose()
 
 
 def main():
     """Main entry point."""
+    # Use uvloop where available for a faster event loop
+    try:
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
     try:
         asyncio.run(run_agent())
     except KeyboardInterrupt:
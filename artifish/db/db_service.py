@@ -9,18 +9,28 @@ import os
 import logging
 from pathlib import Path
 from dotenv import load_dotenv
-from supabase import create_client
 
 # Load environment variables from .env file
 env_path = Path(__file__).parent.parent.parent / '.env'
 load_dotenv(dotenv_path=env_path)
 
 
+class CrawlMemo:
+    """Accounts and follow relationships already written during one crawl."""
+    
+    def __init__(self):
+        self.dids: set[str] = set()
+        self.follows: set[tuple[str, str]] = set()
+
+
 class DatabaseService:
     """Service for database operations related to Bluesky network crawling."""
     
     def __init__(self):
         """Initialize the database service with Supabase client."""
+        # Imported here so loading this module doesn't pull in the Supabase SDK
+        from supabase import create_client
+        
         supabase_url = os.getenv("SUPABASE_URL")
         supabase_key = os.getenv("SUPABASE_KEY")
         
@@ -31,7 +41,10 @@ class DatabaseService:
     
     def add_bluesky_account(self, did, handle, profile_data=None):
         """
-        Add a Bluesky account to the database if it doesn't exist.
+        Add a Bluesky account to the database, updating it if it exists.
+        
+        Unlike the bulk upsert, this never consults a crawl's memo and always
+        writes, so the row is returned.
         
         Args:
             did (str): The decentralized identifier for the Bluesky account
@@ -39,24 +52,8 @@ class DatabaseService:
             profile_data (dict, optional): Additional profile data
             
         Returns:
-            dict: The added or existing account data
+            dict: The added or updated account data
         """
-        # Check if account already exists
-        response = self.supabase.table("bluesky_accounts").select("*").eq("did", did).execute()
-        
-        if response.data:
-            # Account exists, update if needed
-            account = response.data[0]
-            
-            # Update handle if it changed
-            if account["handle"] != handle:
-                update_response = self.supabase.table("bluesky_accounts").update(
-                    {"handle": handle}
-                ).eq("did", did).execute()
-                
-            return account
-        
-        # Account doesn't exist, create it
         account_data = {
             "did": did,
             "handle": handle,
@@ -70,17 +67,16 @@ class DatabaseService:
                 "avatar_url": profile_data.get("avatar"),
             })
         
-        response = self.supabase.table("bluesky_accounts").insert(account_data).execute()
-        
-        if response.data:
-            return response.data[0]
-        
-        return None
+        rows = self._upsert_accounts([account_data])
+        return rows[0] if rows else None
     
     def add_follow_relationship(self, follower_did, following_did):
         """
         Add a follow relationship between two Bluesky accounts.
         
+        Like add_bluesky_account(), this always writes, so the row is
+        returned.
+        
         Args:
             follower_did (str): DID of the follower account
             following_did (str): DID of the account being followed
@@ -88,28 +84,136 @@ class DatabaseService:
         Returns:
             dict: The created relationship data or None if it failed
         """
-        # Check if relationship already exists
-        response = self.supabase.table("follows").select("*").eq(
-            "follower_did", follower_did
-        ).eq("following_did", following_did).execute()
-        
-        if response.data:
-            # Relationship already exists
-            return response.data[0]
-        
-        # Create the relationship
-        relationship_data = {
-            "follower_did": follower_did,
-            "following_did": following_did,
-        }
+        rows = self._upsert_follows([(follower_did, following_did)])
+        return rows[0] if rows else None
+    
+    def add_bluesky_accounts_bulk(self, records, memo=None):
+        """
+        Upsert a batch of Bluesky accounts in a single request.
+        
+        Conflicts on ``did`` are resolved server-side, so no per-row
+        existence check is needed. Accounts already in ``memo`` are skipped
+        without a round-trip.
+        
+        Args:
+            records (list[dict]): Account rows with at least ``did`` and ``handle``
+            memo (CrawlMemo, optional): What the current crawl has written
+            
+        Returns:
+            list[dict]: The upserted account rows
+        """
+        records = self._unseen_accounts(records, memo)
+        
+        if not records:
+            return []
+        
+        rows = self._upsert_accounts(records)
+        if memo is not None:
+            memo.dids.update(row["did"] for row in rows)
+        return rows
+    
+    def _upsert_accounts(self, records):
+        """Upsert account rows."""
+        response = self.supabase.table("bluesky_accounts").upsert(
+            records, on_conflict="did", ignore_duplicates=False
+        ).execute()
+        
+        return response.data or []
+    
+    def add_follow_relationships_bulk(self, pairs, memo=None):
+        """
+        Upsert a batch of follow relationships in a single request.
+        
+        Args:
+            pairs (list[tuple]): ``(follower_did, following_did)`` tuples
+            memo (CrawlMemo, optional): What the current crawl has written
+            
+        Returns:
+            list[dict]: The upserted relationship rows
+        """
+        pairs = self._unseen_follows(pairs, memo)
+        
+        if not pairs:
+            return []
+        
+        rows = self._upsert_follows(pairs)
+        if memo is not None:
+            memo.follows.update((row["follower_did"], row["following_did"]) for row in rows)
+        return rows
+    
+    def _upsert_follows(self, pairs):
+        """Upsert follow relationships."""
+        relationship_data = [
+            {"follower_did": follower_did, "following_did": following_did}
+            for follower_did, following_did in pairs
+        ]
+        
+        response = self.supabase.table("follows").upsert(
+            relationship_data, on_conflict="follower_did,following_did", ignore_duplicates=False
+        ).execute()
+        
+        return response.data or []
+    
+    def apply_crawl_batch(self, records, pairs, memo=None):
+        """
+        Upsert accounts and follow relationships in a single round-trip.
+        
+        Both writes run inside the ``crawl_apply`` SQL function from
+        ``migrations/02_add_crawl_apply.sql``, so they share one request and
+        one transaction. Errors from the call, e.g. when the migration hasn't
+        been applied, are raised to the caller, and nothing is marked as
+        written.
+        
+        Args:
+            records (list[dict]): Account rows with at least ``did`` and ``handle``
+            pairs (list[tuple]): ``(follower_did, following_did)`` tuples
+            memo (CrawlMemo, optional): What the current crawl has written;
+                rows already in it are skipped, and the written rows are added
+        """
+        records = self._unseen_accounts(records, memo)
+        pairs = self._unseen_follows(pairs, memo)
         
-        response = self.supabase.table("follows").insert(relationship_data).execute()
+        if not records and not pairs:
+            return
         
-        if response.data:
-            return response.data[0]
+        edges = [
+            {"follower_did": follower_did, "following_did": following_did}
+            for follower_did, following_did in pairs
+        ]
         
-        return None
+        self.supabase.rpc("crawl_apply", {"accounts": records, "edges": edges}).execute()
+        
+        if memo is not None:
+            memo.dids.update(record["did"] for record in records)
+            memo.follows.update(pairs)
+    
+    @staticmethod
+    def _unseen_accounts(records, memo):
+        """Drop accounts already in the memo and collapse duplicate DIDs."""
+        seen = memo.dids if memo is not None else ()
+        # Postgres rejects an upsert that touches the same row twice
+        return list({
+            record["did"]: record for record in records if record["did"] not in seen
+        }.values())
+    
+    @staticmethod
+    def _unseen_follows(pairs, memo):
+        """Drop follow relationships already in the memo and collapse duplicates."""
+        seen = memo.follows if memo is not None else ()
+        return [pair for pair in dict.fromkeys(pairs) if pair not in seen]
 
 
-# Create a singleton instance
-db_service = DatabaseService()
+_db_service = None
+
+
+def get_db_service():
+    """
+    Get the shared database service, creating it on first use.
+    
+    Returns:
+        DatabaseService: The singleton database service
+    """
+    global _db_service
+    if _db_service is None:
+        _db_service = DatabaseService()
+    return _db_service
@@ -5,32 +5,29 @@ This module provides an ADK tool for crawling Bluesky profiles,
 fetching followers/following relationships, and storing this information.
 """
 
+import asyncio
 import logging
-from typing import Dict, List, Any, Optional, Callable
-from google.adk.tools.base_tool import BaseTool
-from google.adk.tools.function_tool import FunctionTool
-from pydantic import BaseModel, Field
-from atproto import Client as AtprotoClient
-from ..db.db_service import db_service
+import aiohttp
+from typing import AsyncIterator, Dict, List, Any, Optional, Callable, Tuple
+from cachetools import TTLCache
+from ..db.db_service import CrawlMemo, get_db_service
 
 logger = logging.getLogger(__name__)
 
+# Public AppView endpoint for unauthenticated graph queries
+BSKY_PUBLIC_API = "https://public.api.bsky.app/xrpc"
 
-class CrawlRequest(BaseModel):
-    """Request model for the crawler tool."""
-    handle: str = Field(description="The Bluesky handle to crawl")
-    max_depth: int = Field(default=1, description="Maximum depth to crawl")
-    max_per_level: int = Field(default=10, description="Maximum accounts per level")
+# Server-side cap on the page size of getFollows/getFollowers
+MAX_PAGE_SIZE = 100
 
+# Number of concurrent workers draining the crawl queue
+CRAWL_WORKERS = 4
 
-class CrawlResponse(BaseModel):
-    """Response model for the crawler tool."""
-    success: bool
-    accounts_found: int
-    follows_found: int
-    handle: str
-    did: Optional[str] = None
-    error: Optional[str] = None
+# Seconds a resolved profile is reused before being looked up again
+PROFILE_CACHE_TTL = 300
+
+# Batches larger than this yield to the event loop after being written
+YIELD_BATCH_THRESHOLD = 50
 
 
 class NetworkCrawlerService:
@@ -39,6 +36,46 @@ class NetworkCrawlerService:
     def __init__(self):
         """Initialize the network crawler service."""
         self.name = "network_crawler"
+        
+        # One Bluesky client (and HTTP connection pool) shared by every crawl;
+        # the SDK is imported here to keep module import cheap
+        from atproto import Client as AtprotoClient
+        self._client = AtprotoClient()
+        
+        # aiohttp session for the public XRPC endpoints, created lazily
+        self._session: Optional[aiohttp.ClientSession] = None
+        
+        # Bound on in-flight XRPC requests across concurrent crawls
+        self._request_semaphore = asyncio.Semaphore(8)
+        
+        # Recently resolved profiles keyed by lowercased handle
+        self._profile_cache = TTLCache(maxsize=4096, ttl=PROFILE_CACHE_TTL)
+        
+        # ADK tool wrapper, built once on first request
+        self._fn_tool: Optional[Callable] = None
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared aiohttp session, creating it on first use."""
+        if self._session is None or self._session.closed:
+            connector = aiohttp.TCPConnector(limit=100, ttl_dns_cache=300)
+            self._session = aiohttp.ClientSession(connector=connector)
+        return self._session
+    
+    async def __aenter__(self):
+        return self
+    
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.aclose()
+    
+    async def aclose(self):
+        """Close the HTTP sessions used by the crawler."""
+        if self._session is not None:
+            await self._session.close()
+            self._session = None
+        
+        request = getattr(self._client, "request", None)
+        if request is not None:
+            request.close()
     
     async def crawl(self, handle: str, max_depth: int = 1, max_per_level: int = 10) -> Dict[str, Any]:
         """
@@ -52,148 +89,363 @@ class NetworkCrawlerService:
         Returns:
             Dict[str, Any]: Results of the crawl operation.
         """
+        result: Dict[str, Any] = {}
+        async for progress in self.crawl_progress(handle, max_depth, max_per_level):
+            result = progress
+        
+        result.pop("stage", None)
+        return result
+    
+    async def crawl_progress(self, handle: str, max_depth: int = 1,
+                             max_per_level: int = 10) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Crawl the Bluesky network, yielding progress as the crawl advances.
+        
+        Each yielded dict has a ``stage`` key: ``resolved`` once the handle
+        is resolved, ``expanded`` for every account whose follows and
+        followers have been stored, and finally ``done`` (with the same
+        fields ``crawl`` returns) or ``error``. If any account could not be
+        crawled or stored, the final ``error`` also carries those fields, with
+        ``success`` False and ``failed_accounts`` counting the failures.
+        
+        Args:
+            handle (str): The Bluesky handle to start crawling from.
+            max_depth (int): Maximum depth to crawl (default: 1).
+            max_per_level (int): Maximum accounts to process per level (default: 10).
+            
+        Yields:
+            Dict[str, Any]: Progress of the crawl operation.
+        """
         logger.info(f"Starting network crawl from handle: {handle}")
         
+        workers: List[asyncio.Task] = []
         try:
-            # Initialize Bluesky client
-            client = AtprotoClient()
+            # Fail before any fetching if the database isn't configured
+            get_db_service()
+            
+            # What this crawl has written, so shared accounts are sent once;
+            # kept per crawl so concurrent crawls don't reset each other's
+            memo = CrawlMemo()
             
             # Resolve the handle to a DID
-            profile = client.get_profile({"actor": handle})
+            profile = await self._resolve_profile(handle)
             if not profile:
-                return {"error": f"Could not find profile for handle: {handle}"}
+                yield {"stage": "error", "error": f"Could not find profile for handle: {handle}"}
+                return
             
             did = profile.did
+            yield {"stage": "resolved", "handle": handle, "did": did}
+            await asyncio.sleep(0)
             
-            # Add the account to the database
-            db_service.add_bluesky_account(did, handle, profile)
+            # Only the root needs a profile lookup; every other account
+            # arrives with its profile in the follows/followers response
+            root_account = {
+                "did": did,
+                "handle": handle,
+                "profile": {
+                    "displayName": getattr(profile, "display_name", None),
+                    "description": getattr(profile, "description", None),
+                    "avatar": getattr(profile, "avatar", None)
+                }
+            }
             
-            # Start the crawl process
-            accounts_found = 1  # Count the initial account
+            # Breadth-first traversal over a work queue rather than recursion
+            seen_dids = {did}
+            stored_dids = set()
+            failed: List[str] = []
             follows_found = 0
+            queue: asyncio.Queue = asyncio.Queue()
+            queue.put_nowait((root_account, 0))
+            progress: asyncio.Queue = asyncio.Queue()
+            
+            async def worker():
+                nonlocal follows_found
+                while True:
+                    item = await queue.get()
+                    try:
+                        if item is None:
+                            return
+                        
+                        account, depth = item
+                        follows, followers = await self._crawl_account(account, max_per_level, memo)
+                        follows_found += len(follows) + len(followers)
+                        stored_dids.add(account["did"])
+                        stored_dids.update(neighbor["did"] for neighbor in follows + followers)
+                        progress.put_nowait({
+                            "stage": "expanded",
+                            "handle": account["handle"],
+                            "depth": depth,
+                            "follows": len(follows),
+                            "followers": len(followers)
+                        })
+                        
+                        for neighbor in follows + followers:
+                            if neighbor["did"] in seen_dids:
+                                continue
+                            seen_dids.add(neighbor["did"])
+                            if depth + 1 < max_depth:
+                                queue.put_nowait((neighbor, depth + 1))
+                    except Exception as e:
+                        logger.error(f"Error crawling account {item[0]['handle']}: {e}")
+                        failed.append(item[0]["handle"])
+                    finally:
+                        queue.task_done()
+            
+            async def supervisor(pool):
+                # Once the frontier is exhausted, stop each worker with a
+                # sentinel and wait for them before signalling the end
+                await queue.join()
+                for _ in pool:
+                    queue.put_nowait(None)
+                await asyncio.gather(*pool)
+                progress.put_nowait(None)
+            
+            workers = [asyncio.create_task(worker()) for _ in range(CRAWL_WORKERS)]
+            workers.append(asyncio.create_task(supervisor(list(workers))))
+            
+            while True:
+                event = await progress.get()
+                if event is None:
+                    break
+                yield event
+            
+            # The resolved profile may be up to PROFILE_CACHE_TTL old, so take
+            # the counts from a fresh lookup; callers compare them against
+            # get_profile_counts to decide whether a crawl is still current
+            followers_count, follows_count = await self.get_profile_counts(did) or (None, None)
             
-            # Process follows (people the user follows)
-            follows = await self._get_follows(client, did, max_per_level)
-            follows_found += len(follows)
-            
-            for follow in follows:
-                # Add the followed account to the database
-                db_service.add_bluesky_account(
-                    follow["did"], 
-                    follow["handle"],
-                    follow.get("profile")
-                )
-                
-                # Add the follow relationship
-                db_service.add_follow_relationship(did, follow["did"])
-                
-                accounts_found += 1
-            
-            # Process followers
-            followers = await self._get_followers(client, did, max_per_level)
-            follows_found += len(followers)
-            
-            for follower in followers:
-                # Add the follower account to the database
-                db_service.add_bluesky_account(
-                    follower["did"], 
-                    follower["handle"],
-                    follower.get("profile")
-                )
-                
-                # Add the follow relationship
-                db_service.add_follow_relationship(follower["did"], did)
-                
-                accounts_found += 1
-            
-            # Additional recursive crawling would be implemented here if max_depth > 1
-            # For now, we're keeping it simple
-            
-            return {
-                "success": True,
-                "accounts_found": accounts_found,
+            summary = {
+                "success": not failed,
+                "accounts_found": len(stored_dids),
                 "follows_found": follows_found,
+                "failed_accounts": len(failed),
                 "handle": handle,
-                "did": did
+                "did": did,
+                "followers_count": followers_count,
+                "follows_count": follows_count
             }
             
+            if failed:
+                yield {
+                    "stage": "error",
+                    "error": f"Failed to crawl {len(failed)} accounts: {', '.join(failed)}",
+                    **summary
+                }
+            else:
+                yield {"stage": "done", **summary}
+            
         except Exception as e:
             logger.error(f"Error crawling network: {e}")
-            return {"error": str(e)}
+            yield {"stage": "error", "error": str(e)}
+        
+        finally:
+            # Stop any workers still running, e.g. when the consumer closes
+            # us mid-crawl
+            for task in workers:
+                task.cancel()
+    
+    async def _resolve_profile(self, handle: str):
+        """
+        Look up a profile by handle, reusing recent lookups.
+        
+        Args:
+            handle (str): The Bluesky handle to resolve
+            
+        Returns:
+            The atproto profile view, or None if it could not be found
+        """
+        key = handle.lower()
+        profile = self._profile_cache.get(key)
+        
+        if profile is None:
+            # The atproto client is synchronous, so run it off the event loop
+            profile = await asyncio.to_thread(self._client.get_profile, {"actor": handle})
+            if profile:
+                self._profile_cache[key] = profile
+        
+        return profile
+    
+    async def get_profile_counts(self, actor: str) -> Optional[Tuple[int, int]]:
+        """
+        Get an account's follower and follow counts with a single profile lookup.
+        
+        Args:
+            actor (str): Handle or DID of the account
+            
+        Returns:
+            Optional[Tuple[int, int]]: ``(followers_count, follows_count)``, or
+            None if the profile could not be fetched
+        """
+        try:
+            session = await self._get_session()
+            url = f"{BSKY_PUBLIC_API}/app.bsky.actor.getProfile"
+            
+            async with self._request_semaphore:
+                async with session.get(url, params={"actor": actor}) as response:
+                    if response.status != 200:
+                        return None
+                    data = await response.json()
+            
+            return data.get("followersCount"), data.get("followsCount")
+        except Exception as e:
+            logger.error(f"Error getting profile counts for {actor}: {e}")
+            return None
+    
+    async def _crawl_account(self, account: Dict[str, Any], max_per_level: int,
+                             memo: CrawlMemo) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Fetch one account's follows and followers and store them.
+        
+        Args:
+            account (Dict[str, Any]): The account to expand, with did, handle and profile
+            max_per_level (int): Maximum follows and followers to fetch
+            memo (CrawlMemo): What the current crawl has written
+            
+        Returns:
+            Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]: The accounts
+            the account follows and the accounts following it
+        """
+        did = account["did"]
+        
+        # Fetch follows (people the user follows) and followers concurrently
+        follows, followers = await asyncio.gather(
+            self._get_follows(did, max_per_level),
+            self._get_followers(did, max_per_level)
+        )
+        
+        # Accumulate rows so they can be written in one round-trip per table;
+        # the account itself is skipped if this crawl already wrote it
+        account_records = [self._account_record(did, account["handle"], account.get("profile"))]
+        follow_pairs = []
+        
+        for follow in follows:
+            account_records.append(
+                self._account_record(follow["did"], follow["handle"], follow.get("profile"))
+            )
+            follow_pairs.append((did, follow["did"]))
+        
+        for follower in followers:
+            account_records.append(
+                self._account_record(follower["did"], follower["handle"], follower.get("profile"))
+            )
+            follow_pairs.append((follower["did"], did))
+        
+        # Add the accounts and follow relationships to the database in one
+        # round-trip; the Supabase client is synchronous, so run it off the
+        # event loop
+        await asyncio.to_thread(get_db_service().apply_crawl_batch, account_records, follow_pairs, memo)
+        
+        # Give other coroutines a turn after a large batch
+        if len(account_records) > YIELD_BATCH_THRESHOLD:
+            await asyncio.sleep(0)
+        
+        return follows, followers
     
-    async def _get_follows(self, client, did, limit) -> List[Dict[str, Any]]:
+    @staticmethod
+    def _account_record(did: str, handle: str, profile: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+        """
+        Build a ``bluesky_accounts`` row for a bulk upsert.
+        
+        Args:
+            did (str): The DID of the account
+            handle (str): The handle of the account
+            profile (dict, optional): Profile data with displayName/description/avatar
+            
+        Returns:
+            Dict[str, Any]: The account row
+        """
+        profile = profile or {}
+        return {
+            "did": did,
+            "handle": handle,
+            "display_name": profile.get("displayName"),
+            "description": profile.get("description"),
+            "avatar_url": profile.get("avatar"),
+        }
+    
+    async def _get_graph(self, endpoint: str, key: str, did: str, limit: int) -> List[Dict[str, Any]]:
+        """
+        Page through a graph endpoint until ``limit`` accounts are collected.
+        
+        A failed request raises rather than returning a partial list, so the
+        crawl records the account as failed instead of as having no follows.
+        
+        Args:
+            endpoint (str): XRPC method name, e.g. ``app.bsky.graph.getFollows``
+            key (str): Response field holding the accounts
+            did (str): The DID of the user
+            limit (int): Maximum number of accounts to retrieve
+            
+        Returns:
+            List[Dict]: List of account data
+        """
+        accounts = []
+        cursor = None
+        session = await self._get_session()
+        url = f"{BSKY_PUBLIC_API}/{endpoint}"
+        
+        # Each page needs the previous page's cursor, so pages are fetched in order
+        while len(accounts) < limit:
+            params = {"actor": did, "limit": min(MAX_PAGE_SIZE, limit - len(accounts))}
+            if cursor:
+                params["cursor"] = cursor
+            
+            async with self._request_semaphore:
+                async with session.get(url, params=params) as response:
+                    if response.status != 200:
+                        logger.warning(f"Failed to get {key} for {did}: {await response.text()}")
+                        response.raise_for_status()
+                    data = await response.json()
+            
+            page = data.get(key) or []
+            accounts.extend([{
+                "did": account["did"],
+                "handle": account["handle"],
+                "profile": {
+                    "displayName": account.get("displayName"),
+                    "description": account.get("description"),
+                    "avatar": account.get("avatar")
+                }
+            } for account in page])
+            
+            cursor = data.get("cursor")
+            if not cursor or not page:
+                break
+        
+        return accounts[:limit]
+    
+    async def _get_follows(self, did, limit) -> List[Dict[str, Any]]:
         """
         Get the accounts that a user follows.
         
         Args:
-            client: The Bluesky client
             did (str): The DID of the user
             limit (int): Maximum number of follows to retrieve
             
         Returns:
             List[Dict]: List of follow data
         """
-        follows = []
-        try:
-            response = client.get_follows({"actor": did, "limit": limit})
-            
-            if not response or not hasattr(response, "follows"):
-                return follows
-            
-            for follow in response.follows:
-                follows.append({
-                    "did": follow.did,
-                    "handle": follow.handle,
-                    "profile": {
-                        "displayName": getattr(follow, "display_name", None),
-                        "description": getattr(follow, "description", None),
-                        "avatar": getattr(follow, "avatar", None)
-                    }
-                })
-                
-        except Exception as e:
-            logger.error(f"Error getting follows: {e}")
-            
-        return follows
+        return await self._get_graph("app.bsky.graph.getFollows", "follows", did, limit)
     
-    async def _get_followers(self, client, did, limit) -> List[Dict[str, Any]]:
+    async def _get_followers(self, did, limit) -> List[Dict[str, Any]]:
         """
         Get the followers of a user.
         
         Args:
-            client: The Bluesky client
             did (str): The DID of the user
             limit (int): Maximum number of followers to retrieve
             
         Returns:
             List[Dict]: List of follower data
         """
-        followers = []
-        try:
-            response = client.get_followers({"actor": did, "limit": limit})
-            
-            if not response or not hasattr(response, "followers"):
-                return followers
-            
-            for follower in response.followers:
-                followers.append({
-                    "did": follower.did,
-                    "handle": follower.handle,
-                    "profile": {
-                        "displayName": getattr(follower, "display_name", None),
-                        "description": getattr(follower, "description", None),
-                        "avatar": getattr(follower, "avatar", None)
-                    }
-                })
-                
-        except Exception as e:
-            logger.error(f"Error getting followers: {e}")
-            
-        return followers
+        return await self._get_graph("app.bsky.graph.getFollowers", "followers", did, limit)
     
     def get_function_tool(self) -> Callable:
         """Get the function tool for this service."""
-        async def crawl_tool(handle: str, max_depth: int = 1, max_per_level: int = 10) -> Dict[str, Any]:
-            return await self.crawl(handle, max_depth, max_per_level)
+        if self._fn_tool is None:
+            async def crawl_tool(handle: str, max_depth: int = 1, max_per_level: int = 10) -> Dict[str, Any]:
+                return await self.crawl(handle, max_depth, max_per_level)
+            
+            self._fn_tool = crawl_tool
         
-        return crawl_tool
\ No newline at end of file
+        return self._fn_tool
\ No newline at end of file
@@ -1,9 +1,11 @@
 #!/usr/bin/env python3
 """
-Artifish Memgraph Sync using MAGE Migration Module
+Artifish Memgraph Sync
 
-This script synchronizes data from Supabase to Memgraph using the MAGE migration module.
-It supports both initial data loading and periodic updates.
+This script synchronizes data from Supabase to Memgraph. Rows are streamed from
+Postgres through a psycopg server-side cursor and written to Memgraph in
+parameterized UNWIND batches. It supports both initial data loading and
+periodic updates.
 
 Current scope:
 - Bluesky accounts (users)
@@ -19,13 +21,18 @@ Options:
 
 import os
 import sys
-import time
+import asyncio
 import logging
 import argparse
-from datetime import datetime, timedelta
+import gzip
+import json
+from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
 import neo4j
-from neo4j import GraphDatabase
+import psycopg
+from psycopg.rows import dict_row
+from neo4j import AsyncGraphDatabase
+from neo4j.exceptions import TransientError
 
 # Load environment variables from .env file
 load_dotenv()
@@ -41,8 +48,125 @@ logging.basicConfig(
 )
 logger = logging.getLogger("MemgraphSync")
 
+# Supabase queries. Values are always bound as parameters, never formatted
+# into the SQL, so each statement's text is fixed.
+ACCOUNTS_SQL = """
+    SELECT did, handle, display_name, bio, avatar_url, last_updated_at
+    FROM bluesky_accounts
+"""
+ACCOUNTS_SINCE_SQL = ACCOUNTS_SQL + " WHERE last_updated_at > %s"
+
+FOLLOWS_SQL = """
+    SELECT follower_did, following_did, created_at, last_verified_at
+    FROM follows
+    WHERE follow_status = 'active'
+"""
+FOLLOWS_SINCE_SQL = FOLLOWS_SQL + " AND last_verified_at > %s"
+
+UNFOLLOWS_SINCE_SQL = """
+    SELECT follower_did, following_did
+    FROM follows
+    WHERE follow_status = 'unfollowed' AND unfollowed_at > %s
+"""
+
+# Timestamps are stored as fixed-width UTC strings, so comparing them as text
+# orders them in time
+TIMESTAMP_FORMAT = '%Y-%m-%dT%H:%M:%S.%f+00:00'
+
+# Memgraph batch writes. Each takes a $rows list and returns the number of rows
+# processed; the text never changes, so Memgraph can reuse the cached plan.
+# Existing nodes and relationships are only rewritten when the incoming row
+# is newer, so re-synced rows don't generate no-op writes.
+ACCOUNTS_UPSERT_CQL = """
+    UNWIND $rows AS row
+    MERGE (u:User {did: row.did})
+    ON CREATE SET 
+        u.handle = row.handle,
+        u.display_name = row.display_name,
+        u.bio = row.bio,
+        u.avatar_url = row.avatar_url,
+        u.updated_at = row.last_updated_at
+    WITH u, row
+    FOREACH (_ IN CASE WHEN coalesce(u.updated_at, '') < coalesce(row.last_updated_at, '') THEN [1] ELSE [] END |
+        SET 
+            u.handle = row.handle,
+            u.display_name = row.display_name,
+            u.bio = row.bio,
+            u.avatar_url = row.avatar_url,
+            u.updated_at = row.last_updated_at
+    )
+    RETURN count(*) AS count
+"""
+
+# Follow endpoints are merged in one write per batch before its follows, so
+# the concurrent follow writes only MATCH existing nodes
+FOLLOW_USERS_MERGE_CQL = """
+    UNWIND $rows AS row
+    MERGE (u:User {did: row.did})
+    RETURN count(*) AS count
+"""
+
+FOLLOWS_UPSERT_CQL = """
+    UNWIND $rows AS row
+    MATCH (follower:User {did: row.follower_did})
+    MATCH (following:User {did: row.following_did})
+    MERGE (follower)-[r:FOLLOWS]->(following)
+    ON CREATE SET 
+        r.created_at = row.created_at,
+        r.last_verified_at = row.last_verified_at
+    WITH r, row
+    FOREACH (_ IN CASE WHEN coalesce(r.last_verified_at, '') < coalesce(row.last_verified_at, '') THEN [1] ELSE [] END |
+        SET r.last_verified_at = row.last_verified_at
+    )
+    RETURN count(*) AS count
+"""
+
+# Initial sync through LOAD CSV. Timestamps are exported in the same UTC form
+# as TIMESTAMP_FORMAT, so later comparisons stay consistent.
+ACCOUNTS_CSV_SQL = """
+    SELECT did, handle, display_name, bio, avatar_url,
+           to_char(last_updated_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"') AS last_updated_at
+    FROM bluesky_accounts
+"""
+
+FOLLOWS_CSV_SQL = """
+    SELECT follower_did, following_did,
+           to_char(created_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"') AS created_at,
+           to_char(last_verified_at AT TIME ZONE 'UTC', 'YYYY-MM-DD"T"HH24:MI:SS.US"+00:00"') AS last_verified_at
+    FROM follows
+    WHERE follow_status = 'active'
+"""
+
+ACCOUNTS_LOAD_CSV_CQL = """
+    LOAD CSV FROM '{path}' WITH HEADER NULLIF '' AS row
+    MERGE (u:User {{did: row.did}})
+    SET 
+        u.handle = row.handle,
+        u.display_name = row.display_name,
+        u.bio = row.bio,
+        u.avatar_url = row.avatar_url,
+        u.updated_at = row.last_updated_at
+"""
+
+FOLLOWS_LOAD_CSV_CQL = """
+    LOAD CSV FROM '{path}' WITH HEADER NULLIF '' AS row
+    MERGE (follower:User {{did: row.follower_did}})
+    MERGE (following:User {{did: row.following_did}})
+    MERGE (follower)-[r:FOLLOWS]->(following)
+    SET 
+        r.created_at = row.created_at,
+        r.last_verified_at = row.last_verified_at
+"""
+
+UNFOLLOWS_DELETE_CQL = """
+    UNWIND $rows AS row
+    MATCH (follower:User {did: row.follower_did})-[r:FOLLOWS]->(following:User {did: row.following_did})
+    DELETE r
+    RETURN count(*) AS count
+"""
+
 class MemgraphSync:
-    """Synchronizes data from Supabase to Memgraph using MAGE migration."""
+    """Synchronizes data from Supabase to Memgraph."""
     
     def __init__(self):
         """Initialize the Memgraph sync."""
@@ -63,32 +187,94 @@ class MemgraphSync:
             sys.exit(1)
             
         # Configuration
-        self.batch_size = 1000
+        self.batch_size = 10000
+        self.initial_batch_size = 50000  # Larger batches for analytical bulk loads
+        self.write_workers = 8  # Concurrent Memgraph write sessions
+        self.write_retries = 3
         self.sync_interval = timedelta(hours=1)  # Minimum time between syncs
         
+        # Directory shared with Memgraph for LOAD CSV on initial syncs: where
+        # this script writes the exports, and where Memgraph sees them
+        self.csv_export_dir = os.getenv("MEMGRAPH_IMPORT_DIR", "")
+        self.csv_import_path = os.getenv("MEMGRAPH_IMPORT_PATH", self.csv_export_dir)
+        
+        # Local copy of the sync timestamps, so runs don't have to query
+        # Memgraph for them; Metadata nodes remain the durable backup. It lives
+        # next to this script, so runs from cron or another directory share it
+        self.state_path = os.getenv(
+            "MEMGRAPH_SYNC_STATE",
+            os.path.join(os.path.dirname(os.path.abspath(__file__)), ".sync_state.json")
+        )
+        self._state = self._load_state()
+        self._state_checked = False
+        
         # Connect to Memgraph
         try:
-            self.driver = GraphDatabase.driver(
+            self.driver = AsyncGraphDatabase.driver(
                 self.memgraph_uri,
-                auth=(self.memgraph_user, self.memgraph_password) if self.memgraph_user else None
+                auth=(self.memgraph_user, self.memgraph_password) if self.memgraph_user else None,
+                max_connection_pool_size=int(os.getenv("MEMGRAPH_POOL_SIZE", "32")),
+                connection_acquisition_timeout=float(os.getenv("MEMGRAPH_ACQUISITION_TIMEOUT", "60")),
+                max_connection_lifetime=float(os.getenv("MEMGRAPH_CONNECTION_LIFETIME", "3600")),
+                connection_timeout=float(os.getenv("MEMGRAPH_CONNECTION_TIMEOUT", "30")),
+                keep_alive=True
             )
             logger.info(f"Connected to Memgraph at {self.memgraph_uri}")
         except Exception as e:
             logger.error(f"Failed to connect to Memgraph: {e}")
             sys.exit(1)
+        
+        self.pg_conn = None
+    
+    async def connect(self):
+        """Connect to Supabase PostgreSQL once for the whole sync."""
+        try:
+            self.pg_conn = await psycopg.AsyncConnection.connect(
+                host=self.supabase_db_host,
+                dbname=self.supabase_db_name,
+                user=self.supabase_db_user,
+                password=self.supabase_db_password,
+                autocommit=True,
+                row_factory=dict_row
+            )
+            logger.info(f"Connected to Supabase PostgreSQL at {self.supabase_db_host}")
+        except Exception as e:
+            logger.error(f"Failed to connect to Supabase PostgreSQL: {e}")
+            await self.driver.close()
+            sys.exit(1)
     
-    def close(self):
-        """Close the Memgraph connection."""
+    async def close(self):
+        """Close the Memgraph and PostgreSQL connections."""
         if hasattr(self, 'driver'):
-            self.driver.close()
+            await self.driver.close()
+        if self.pg_conn is not None:
+            await self.pg_conn.close()
     
-    def setup_schema(self):
-        """Set up the initial schema with constraints and indexes."""
+    async def setup_schema(self, initial=False):
+        """
+        Set up the initial schema with constraints and indexes.
+        
+        Args:
+            initial: Whether this is an initial full sync. Secondary indexes
+                are then left to finalize_schema() so the bulk load doesn't
+                have to maintain them.
+        """
         logger.info("Setting up Memgraph schema")
         
-        with self.driver.session() as session:
+        async with self.driver.session() as session:
             # Switch to analytical mode for better import performance
-            session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
+            await session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
+            
+            # MERGE on did needs a label-property index; in Memgraph the
+            # uniqueness constraint alone doesn't provide one
+            try:
+                await session.run("CREATE INDEX ON :User(did)")
+                logger.info("Created index: CREATE INDEX ON :User(did)")
+            except Exception as e:
+                if "already exists" in str(e):
+                    logger.info("Index already exists: CREATE INDEX ON :User(did)")
+                else:
+                    logger.warning(f"Error creating index: {e}")
             
             # Create constraints for main entity types
             for constraint in [
@@ -96,7 +282,7 @@ class MemgraphSync:
                 "CREATE CONSTRAINT ON (a:Artifish) ASSERT a.artifish_id IS UNIQUE"
             ]:
                 try:
-                    session.run(constraint)
+                    await session.run(constraint)
                     logger.info(f"Created constraint: {constraint}")
                 except Exception as e:
                     if "already exists" in str(e):
@@ -104,21 +290,103 @@ class MemgraphSync:
                     else:
                         logger.warning(f"Error creating constraint: {e}")
             
-            # Create indexes for better query performance
-            for index in [
-                "CREATE INDEX ON :User(handle)",
-                "CREATE INDEX ON :User(display_name)"
-            ]:
-                try:
-                    session.run(index)
-                    logger.info(f"Created index: {index}")
-                except Exception as e:
-                    if "already exists" in str(e):
-                        logger.info(f"Index already exists: {index}")
-                    else:
-                        logger.warning(f"Error creating index: {e}")
+            if not initial:
+                await self._create_indexes(session)
+    
+    async def finalize_schema(self):
+        """Create the secondary indexes deferred during an initial sync."""
+        logger.info("Creating deferred Memgraph indexes")
+        
+        async with self.driver.session() as session:
+            await self._create_indexes(session)
+    
+    async def _create_indexes(self, session):
+        """Create indexes for better query performance."""
+        for index in [
+            "CREATE INDEX ON :User(handle)",
+            "CREATE INDEX ON :User(display_name)"
+        ]:
+            try:
+                await session.run(index)
+                logger.info(f"Created index: {index}")
+            except Exception as e:
+                if "already exists" in str(e):
+                    logger.info(f"Index already exists: {index}")
+                else:
+                    logger.warning(f"Error creating index: {e}")
+    
+    def _load_state(self):
+        """Load the sync timestamps saved by the previous run, if any."""
+        try:
+            with open(self.state_path) as f:
+                return json.load(f)
+        except FileNotFoundError:
+            return {}
+        except (OSError, ValueError) as e:
+            logger.warning(f"Ignoring unreadable sync state {self.state_path}: {e}")
+            return {}
+    
+    def _save_state(self):
+        """Atomically write the sync timestamps to the local state file."""
+        tmp_path = f"{self.state_path}.tmp"
+        
+        with open(tmp_path, "w") as f:
+            json.dump(self._state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        
+        os.replace(tmp_path, self.state_path)
+    
+    async def _check_state(self):
+        """
+        Discard the local sync state if the graph it describes is gone.
+        
+        Every run mirrors its timestamps to Metadata nodes, so a graph without
+        any has been wiped or recreated since the state was saved. Trusting
+        the file would then run an incremental sync into an empty graph.
+        """
+        if self._state_checked or not self._state:
+            return
+        self._state_checked = True
+        
+        async with self.driver.session() as session:
+            result = await session.run("MATCH (m:Metadata) RETURN m.key AS key LIMIT 1")
+            record = await result.single()
+        
+        if record is None:
+            logger.warning(f"Memgraph has no sync metadata, ignoring local sync state {self.state_path}")
+            self._state = {}
+    
+    async def _read_timestamp(self, key):
+        """
+        Look up a sync timestamp.
+        
+        The local state file is checked first; the Memgraph Metadata node is
+        only queried when there is no local copy, e.g. on a fresh checkout.
+        The local copy is ignored if Memgraph has no Metadata nodes at all.
+        
+        Args:
+            key: Metadata key, e.g. 'last_sync'
+            
+        Returns:
+            str: The ISO timestamp, or None if it was never recorded
+        """
+        await self._check_state()
+        
+        if key in self._state:
+            return self._state[key]
+        
+        async with self.driver.session() as session:
+            result = await session.run("""
+                MATCH (m:Metadata {key: $key})
+                RETURN m.timestamp AS timestamp
+            """, {"key": key})
+            
+            record = await result.single()
+        
+        return record["timestamp"] if record else None
     
-    def check_last_sync(self, force=False):
+    async def check_last_sync(self, force=False):
         """
         Check when the last sync was performed.
         
@@ -130,337 +398,353 @@ class MemgraphSync:
         """
         if force:
             return True
+        
+        timestamp = await self._read_timestamp("last_sync")
+        if not timestamp:
+            return True
             
-        with self.driver.session() as session:
-            result = session.run("""
-                MATCH (m:Metadata {key: 'last_sync'})
-                RETURN m.timestamp AS timestamp
-            """)
+        try:
+            last_sync = datetime.fromisoformat(timestamp)
+            if last_sync.tzinfo is None:
+                # Timestamps from before syncs recorded UTC are local time
+                last_sync = last_sync.astimezone(timezone.utc)
+            now = datetime.now(timezone.utc)
             
-            record = result.single()
-            if not record:
-                return True
+            if now - last_sync < self.sync_interval:
+                logger.info(f"Last sync was {now - last_sync} ago, skipping (use --force to override)")
+                return False
                 
-            try:
-                last_sync = datetime.fromisoformat(record["timestamp"])
-                now = datetime.now()
+            return True
+        except Exception as e:
+            logger.warning(f"Error parsing last sync timestamp: {e}")
+            return True
+    
+    async def update_sync_timestamp(self, session, timestamp):
+        """
+        Update the sync timestamp metadata.
+        
+        All timestamps recorded during the run are saved to the local state
+        file and mirrored to Memgraph Metadata nodes in one statement.
+        
+        Args:
+            session: Open Memgraph session to write the Metadata nodes with
+            timestamp: ISO timestamp of when the run started
+        """
+        self._state["last_sync"] = timestamp
+        
+        self._save_state()
+        
+        await session.run("""
+            UNWIND keys($state) AS key
+            MERGE (m:Metadata {key: key})
+            SET m.timestamp = $state[key]
+        """, {"state": self._state})
+        
+        logger.info(f"Updated sync timestamp to {timestamp}")
+    
+    async def _fetch_batches(self, name, query, params=()):
+        """
+        Stream the results of a query from Supabase in batches.
+        
+        The query runs once on a named server-side cursor, so rows are pulled
+        over a single connection without re-running the query per batch.
+        Results use the binary protocol, so timestamps arrive without text
+        formatting and parsing on either side.
+        
+        Args:
+            name: Name of the server-side cursor
+            query: SQL query with %s placeholders
+            params: Query parameters
+            
+        Yields:
+            list[dict]: Up to batch_size rows, with timestamps as UTC strings
+                in TIMESTAMP_FORMAT
+        """
+        async with self.pg_conn.transaction():
+            async with self.pg_conn.cursor(name=name, binary=True) as cur:
+                await cur.execute(query, params)
                 
-                if now - last_sync < self.sync_interval:
-                    logger.info(f"Last sync was {now - last_sync} ago, skipping (use --force to override)")
-                    return False
-                    
-                return True
-            except Exception as e:
-                logger.warning(f"Error parsing last sync timestamp: {e}")
-                return True
+                while rows := await cur.fetchmany(self.batch_size):
+                    yield [
+                        {k: self._format_timestamp(v) if isinstance(v, datetime) else v for k, v in row.items()}
+                        for row in rows
+                    ]
+    
+    @staticmethod
+    def _format_timestamp(value):
+        """
+        Format a datetime from Supabase as a UTC string in TIMESTAMP_FORMAT.
+        
+        Naive values come from columns without a time zone, which hold UTC;
+        they are labelled as such rather than converted from the host's
+        local time.
+        """
+        if value.tzinfo is None:
+            value = value.replace(tzinfo=timezone.utc)
+        return value.astimezone(timezone.utc).strftime(TIMESTAMP_FORMAT)
     
-    def update_sync_timestamp(self):
-        """Update the sync timestamp metadata."""
-        timestamp = datetime.now().isoformat()
-        
-        with self.driver.session() as session:
-            # Check if metadata node exists
-            result = session.run("""
-                MATCH (m:Metadata {key: 'last_sync'})
-                RETURN count(m) as count
-            """)
+    @staticmethod
+    async def _dedupe(batches, key, timestamp_field):
+        """
+        Collapse duplicate rows within each batch, keeping the most recent.
+        
+        Args:
+            batches: Async iterable of row batches
+            key: Function returning a row's identity
+            timestamp_field: Field used to pick the most recent duplicate
             
-            count = result.single()["count"]
+        Yields:
+            list[dict]: The batch with one row per key
+        """
+        async for rows in batches:
+            latest = {}
+            for row in rows:
+                prev = latest.get(key(row))
+                if prev is None or (row[timestamp_field] or "") > (prev[timestamp_field] or ""):
+                    latest[key(row)] = row
+            yield list(latest.values())
+    
+    async def _write_batch(self, query, rows):
+        """
+        Write one batch to Memgraph in its own session.
+        
+        The query runs as an auto-commit query rather than in an explicit
+        transaction. This is intentional: the sync runs in analytical storage
+        mode, where an explicit transaction only adds overhead. Transient
+        errors, such as conflicting concurrent MERGEs, are retried with a short
+        backoff.
+        
+        Args:
+            query: Cypher query taking $rows and returning a count
+            rows: The batch of rows
             
-            if count > 0:
-                # Update existing node
-                session.run("""
-                    MATCH (m:Metadata {key: 'last_sync'})
-                    SET m.timestamp = $timestamp
-                """, {"timestamp": timestamp})
-            else:
-                # Create new metadata node
-                session.run("""
-                    CREATE (m:Metadata {
-                        key: 'last_sync',
-                        timestamp: $timestamp
-                    })
-                """, {"timestamp": timestamp})
+        Returns:
+            int: The count returned by the query
+        """
+        for attempt in range(1, self.write_retries + 1):
+            try:
+                async with self.driver.session(default_access_mode=neo4j.WRITE_ACCESS) as session:
+                    result = await session.run(query, {"rows": rows})
+                    return (await result.single())["count"]
+            except TransientError as e:
+                if attempt == self.write_retries:
+                    raise
+                logger.warning(f"Transient error writing batch (attempt {attempt}): {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+    
+    async def _write_batches(self, query, batches):
+        """
+        Write batches to Memgraph with several writes in flight at once.
+        
+        Batches are pulled from the iterator as write slots free up, so at
+        most write_workers batches are held in memory at once and fetching the
+        next batch overlaps with writing the previous ones. The first failed
+        write stops the fetching, and any error cancels the writes in flight.
+        
+        Args:
+            query: Cypher query taking $rows and returning a count
+            batches: Async iterable of row batches
+            
+        Returns:
+            int: Sum of the counts returned for each batch
+        """
+        pending = asyncio.Semaphore(self.write_workers)
+        
+        async def write(rows):
+            try:
+                return await self._write_batch(query, rows)
+            finally:
+                pending.release()
+        
+        tasks = set()
+        total = 0
+        
+        try:
+            async for rows in batches:
+                await pending.acquire()
+                
+                # Collect finished writes; result() raises if one failed
+                for task in [task for task in tasks if task.done()]:
+                    tasks.discard(task)
+                    total += task.result()
                 
-            logger.info(f"Updated sync timestamp to {timestamp}")
+                tasks.add(asyncio.create_task(write(rows)))
+            
+            return total + sum(await asyncio.gather(*tasks))
+        except BaseException:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            raise
     
-    def sync_accounts(self, initial=False):
+    async def _partition_by_follower(self, batches):
+        """
+        Split each batch into one sub-batch per writer, keyed on follower_did.
+        
+        The endpoints of the whole batch are merged first, in a single write,
+        so the sub-batches only MATCH their User nodes. Followers are spread
+        across writers, but followed accounts are shared between sub-batches
+        and with the previous batch's writes still in flight, so concurrent
+        writers can still conflict on them; _write_batch retries those. Each
+        sub-batch is sorted by follower_did so consecutive writes hit the
+        same follower.
+        """
+        async for rows in batches:
+            dids = {row["follower_did"] for row in rows} | {row["following_did"] for row in rows}
+            await self._write_batch(FOLLOW_USERS_MERGE_CQL, [{"did": did} for did in dids])
+            
+            buckets = [[] for _ in range(self.write_workers)]
+            for row in rows:
+                buckets[hash(row["follower_did"]) % self.write_workers].append(row)
+            for bucket in buckets:
+                if bucket:
+                    bucket.sort(key=lambda row: row["follower_did"])
+                    yield bucket
+    
+    async def sync_accounts(self, initial=False, timestamp=None):
         """
         Sync Bluesky accounts from Supabase to Memgraph.
         
         Args:
             initial: Whether this is an initial full sync
+            timestamp: ISO timestamp to record as the accounts sync time;
+                defaults to now
         """
         logger.info(f"{'Initial' if initial else 'Incremental'} sync of Bluesky accounts")
         
-        with self.driver.session() as session:
-            # Get last sync timestamp if this is an incremental sync
-            where_clause = ""
-            if not initial:
-                # Get the last sync timestamp
-                result = session.run("""
-                    MATCH (m:Metadata {key: 'last_accounts_sync'})
-                    RETURN m.timestamp AS timestamp
-                """)
-                
-                record = result.single()
-                if record and record["timestamp"]:
-                    last_sync = record["timestamp"]
-                    where_clause = f"WHERE last_updated_at > '{last_sync}'"
-                    logger.info(f"Syncing accounts updated since {last_sync}")
+        # Get last sync timestamp if this is an incremental sync
+        query = ACCOUNTS_SQL
+        params = ()
+        
+        if not initial:
+            last_sync = await self._read_timestamp("last_accounts_sync")
+            if last_sync:
+                query = ACCOUNTS_SINCE_SQL
+                params = (last_sync,)
+                logger.info(f"Syncing accounts updated since {last_sync}")
+        
+        try:
+            total = await self._write_batches(ACCOUNTS_UPSERT_CQL, self._dedupe(
+                self._fetch_batches("accounts", query, params),
+                key=lambda row: row["did"],
+                timestamp_field="last_updated_at"
+            ))
             
-            # Use MAGE migration to import accounts
-            try:
-                query = f"""
-                    CALL migrate.postgresql(
-                        'SELECT did, handle, display_name, bio, avatar_url, last_updated_at 
-                        FROM bluesky_accounts
-                        {where_clause}
-                        ORDER BY last_updated_at 
-                        LIMIT {self.batch_size}',
-                        {{
-                            user: $user,
-                            password: $password,
-                            host: $host,
-                            database: $database
-                        }}
-                    ) 
-                    YIELD row
-                    MERGE (u:User {{did: row.did}})
-                    SET 
-                        u.handle = row.handle,
-                        u.display_name = row.display_name,
-                        u.bio = row.bio,
-                        u.avatar_url = row.avatar_url,
-                        u.updated_at = row.last_updated_at
-                    RETURN count(*) as count
-                """
-                
-                result = session.run(
-                    query,
-                    {
-                        "user": self.supabase_db_user,
-                        "password": self.supabase_db_password,
-                        "host": self.supabase_db_host,
-                        "database": self.supabase_db_name
-                    }
-                )
-                
-                count = result.single()["count"]
-                logger.info(f"Imported {count} Bluesky accounts")
-                
-                # Update the accounts sync timestamp
-                timestamp = datetime.now().isoformat()
-                session.run("""
-                    MERGE (m:Metadata {key: 'last_accounts_sync'})
-                    SET m.timestamp = $timestamp
-                """, {"timestamp": timestamp})
-                
-                # Continue importing in batches if needed
-                while count > 0 and count == self.batch_size:
-                    # If we imported a full batch, there might be more to import
-                    # Update the where clause to get the next batch
-                    if not initial:
-                        where_clause = f"WHERE last_updated_at > '{last_sync}'"
-                    
-                    query = f"""
-                        CALL migrate.postgresql(
-                            'SELECT did, handle, display_name, bio, avatar_url, last_updated_at 
-                            FROM bluesky_accounts
-                            {where_clause}
-                            ORDER BY last_updated_at 
-                            OFFSET {self.batch_size} 
-                            LIMIT {self.batch_size}',
-                            {{
-                                user: $user,
-                                password: $password,
-                                host: $host,
-                                database: $database
-                            }}
-                        ) 
-                        YIELD row
-                        MERGE (u:User {{did: row.did}})
-                        SET 
-                            u.handle = row.handle,
-                            u.display_name = row.display_name,
-                            u.bio = row.bio,
-                            u.avatar_url = row.avatar_url,
-                            u.updated_at = row.last_updated_at
-                        RETURN count(*) as count
-                    """
-                    
-                    result = session.run(
-                        query,
-                        {
-                            "user": self.supabase_db_user,
-                            "password": self.supabase_db_password,
-                            "host": self.supabase_db_host,
-                            "database": self.supabase_db_name
-                        }
-                    )
-                    
-                    count = result.single()["count"]
-                    logger.info(f"Imported {count} additional Bluesky accounts")
-                
-            except Exception as e:
-                logger.error(f"Error importing accounts: {e}")
+            logger.info(f"Imported {total} Bluesky accounts")
+            
+            # Record the accounts sync timestamp; saved at the end of the run
+            self._state["last_accounts_sync"] = timestamp or datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+            
+        except Exception as e:
+            logger.error(f"Error importing accounts: {e}")
     
-    def sync_follows(self, initial=False):
+    async def sync_follows(self, initial=False, timestamp=None):
         """
         Sync follow relationships from Supabase to Memgraph.
         
+        Endpoints missing from the graph are created as bare User nodes, so
+        follows aren't dropped when their accounts haven't been synced yet.
+        
         Args:
             initial: Whether this is an initial full sync
+            timestamp: ISO timestamp to record as the follows sync time;
+                defaults to now
         """
         logger.info(f"{'Initial' if initial else 'Incremental'} sync of follow relationships")
         
-        with self.driver.session() as session:
-            # Get last sync timestamp if this is an incremental sync
-            where_clause = "WHERE follow_status = 'active'"
-            if not initial:
-                # Get the last sync timestamp
-                result = session.run("""
-                    MATCH (m:Metadata {key: 'last_follows_sync'})
-                    RETURN m.timestamp AS timestamp
-                """)
-                
-                record = result.single()
-                if record and record["timestamp"]:
-                    last_sync = record["timestamp"]
-                    where_clause = f"WHERE follow_status = 'active' AND last_verified_at > '{last_sync}'"
-                    logger.info(f"Syncing follows updated since {last_sync}")
+        # Get last sync timestamp if this is an incremental sync
+        last_sync = None
+        query = FOLLOWS_SQL
+        params = ()
+        
+        if not initial:
+            last_sync = await self._read_timestamp("last_follows_sync")
+            if last_sync:
+                query = FOLLOWS_SINCE_SQL
+                params = (last_sync,)
+                logger.info(f"Syncing follows updated since {last_sync}")
+        
+        # Import active follows
+        try:
+            total = await self._write_batches(FOLLOWS_UPSERT_CQL, self._partition_by_follower(self._dedupe(
+                self._fetch_batches("follows", query, params),
+                key=lambda row: (row["follower_did"], row["following_did"]),
+                timestamp_field="last_verified_at"
+            )))
+            
+            logger.info(f"Imported {total} follow relationships")
             
-            # Import active follows
+            # Record the follows sync timestamp; saved at the end of the run
+            self._state["last_follows_sync"] = timestamp or datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+            
+        except Exception as e:
+            logger.error(f"Error importing follows: {e}")
+        
+        # Also handle unfollows if this is an incremental sync
+        if not initial and last_sync:
             try:
-                query = f"""
-                    CALL migrate.postgresql(
-                        'SELECT follower_did, following_did, created_at, last_verified_at
-                        FROM follows
-                        {where_clause}
-                        ORDER BY last_verified_at 
-                        LIMIT {self.batch_size}',
-                        {{
-                            user: $user,
-                            password: $password,
-                            host: $host,
-                            database: $database
-                        }}
-                    ) 
-                    YIELD row
-                    MATCH (follower:User {{did: row.follower_did}})
-                    MATCH (following:User {{did: row.following_did}})
-                    MERGE (follower)-[r:FOLLOWS]->(following)
-                    SET 
-                        r.created_at = row.created_at,
-                        r.last_verified_at = row.last_verified_at
-                    RETURN count(*) as count
-                """
+                # Get unfollowed relationships
+                count = await self._write_batches(UNFOLLOWS_DELETE_CQL, self._fetch_batches("unfollows", UNFOLLOWS_SINCE_SQL, (last_sync,)))
                 
-                result = session.run(
-                    query,
-                    {
-                        "user": self.supabase_db_user,
-                        "password": self.supabase_db_password,
-                        "host": self.supabase_db_host,
-                        "database": self.supabase_db_name
-                    }
-                )
-                
-                count = result.single()["count"]
-                logger.info(f"Imported {count} follow relationships")
-                
-                # Update the follows sync timestamp
-                timestamp = datetime.now().isoformat()
-                session.run("""
-                    MERGE (m:Metadata {key: 'last_follows_sync'})
-                    SET m.timestamp = $timestamp
-                """, {"timestamp": timestamp})
-                
-                # Continue importing in batches if needed
-                while count > 0 and count == self.batch_size:
-                    # If we imported a full batch, there might be more to import
-                    # Update the offset to get the next batch
-                    query = f"""
-                        CALL migrate.postgresql(
-                            'SELECT follower_did, following_did, created_at, last_verified_at
-                            FROM follows
-                            {where_clause}
-                            ORDER BY last_verified_at 
-                            OFFSET {self.batch_size} 
-                            LIMIT {self.batch_size}',
-                            {{
-                                user: $user,
-                                password: $password,
-                                host: $host,
-                                database: $database
-                            }}
-                        ) 
-                        YIELD row
-                        MATCH (follower:User {{did: row.follower_did}})
-                        MATCH (following:User {{did: row.following_did}})
-                        MERGE (follower)-[r:FOLLOWS]->(following)
-                        SET 
-                            r.created_at = row.created_at,
-                            r.last_verified_at = row.last_verified_at
-                        RETURN count(*) as count
-                    """
-                    
-                    result = session.run(
-                        query,
-                        {
-                            "user": self.supabase_db_user,
-                            "password": self.supabase_db_password,
-                            "host": self.supabase_db_host,
-                            "database": self.supabase_db_name
-                        }
-                    )
-                    
-                    count = result.single()["count"]
-                    logger.info(f"Imported {count} additional follow relationships")
+                logger.info(f"Removed {count} unfollowed relationships")
                 
             except Exception as e:
-                logger.error(f"Error importing follows: {e}")
+                logger.error(f"Error processing unfollows: {e}")
+    
+    async def _export_csv(self, filename, query):
+        """
+        Export a Supabase query to a gzipped CSV file for LOAD CSV.
+        
+        Args:
+            filename: Name of the file in the shared import directory
+            query: SQL query to export
             
-            # Also handle unfollows if this is an incremental sync
-            if not initial:
-                try:
-                    # Get unfollowed relationships
-                    query = f"""
-                        CALL migrate.postgresql(
-                            'SELECT follower_did, following_did
-                            FROM follows
-                            WHERE follow_status = ''unfollowed'' AND unfollowed_at > ''{last_sync}''
-                            LIMIT {self.batch_size}',
-                            {{
-                                user: $user,
-                                password: $password,
-                                host: $host,
-                                database: $database
-                            }}
-                        ) 
-                        YIELD row
-                        MATCH (follower:User {{did: row.follower_did}})-[r:FOLLOWS]->(following:User {{did: row.following_did}})
-                        DELETE r
-                        RETURN count(*) as count
-                    """
-                    
-                    result = session.run(
-                        query,
-                        {
-                            "user": self.supabase_db_user,
-                            "password": self.supabase_db_password,
-                            "host": self.supabase_db_host,
-                            "database": self.supabase_db_name
-                        }
-                    )
-                    
-                    count = result.single()["count"]
-                    logger.info(f"Removed {count} unfollowed relationships")
-                    
-                except Exception as e:
-                    logger.error(f"Error processing unfollows: {e}")
+        Returns:
+            str: Path of the file as seen by Memgraph
+        """
+        path = os.path.join(self.csv_export_dir, filename)
+        
+        async with self.pg_conn.cursor() as cur:
+            async with cur.copy(f"COPY ({query}) TO STDOUT WITH (FORMAT csv, HEADER)") as copy:
+                with gzip.open(path, "wb") as f:
+                    async for data in copy:
+                        f.write(data)
+        
+        logger.info(f"Exported {filename}")
+        return f"{self.csv_import_path.rstrip('/')}/{filename}"
     
-    def run(self, initial=False, force=False):
+    async def sync_initial_csv(self, timestamp=None):
+        """
+        Load all accounts and active follows through LOAD CSV.
+        
+        Both tables are exported from Supabase with COPY into gzipped CSV
+        files in a directory Memgraph can read, which Memgraph then loads in
+        a single query each, without per-batch Bolt round-trips.
+        
+        Args:
+            timestamp: ISO timestamp to record as the sync time; defaults to now
+        """
+        logger.info("Initial sync of Bluesky accounts and follows through LOAD CSV")
+        
+        accounts_path = await self._export_csv("accounts.csv.gz", ACCOUNTS_CSV_SQL)
+        follows_path = await self._export_csv("follows.csv.gz", FOLLOWS_CSV_SQL)
+        
+        async with self.driver.session() as session:
+            await session.run(ACCOUNTS_LOAD_CSV_CQL.format(path=accounts_path))
+            logger.info("Loaded Bluesky accounts")
+            
+            # Release memory held by the account import before loading follows
+            await session.run("FREE MEMORY")
+            
+            await session.run(FOLLOWS_LOAD_CSV_CQL.format(path=follows_path))
+            logger.info("Loaded follow relationships")
+        
+        # Record the sync timestamps; saved at the end of the run
+        timestamp = timestamp or datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
+        self._state["last_accounts_sync"] = timestamp
+        self._state["last_follows_sync"] = timestamp
+    
+    async def run(self, initial=False, force=False):
         """
         Run the synchronization process.
         
@@ -469,41 +753,61 @@ class MemgraphSync:
             force: Force sync even if recent sync was performed
         """
         # Check if we should proceed with sync
-        if not self.check_last_sync(force):
+        if not await self.check_last_sync(force):
             return
+        
+        # Every timestamp recorded by this run is its start time, so rows
+        # changed while it runs are picked up again next time
+        self.run_started_at = datetime.now(timezone.utc).strftime(TIMESTAMP_FORMAT)
             
         try:
             # Set up schema
-            self.setup_schema()
+            await self.setup_schema(initial)
             
             # Switch to analytical mode for better import performance
-            with self.driver.session() as session:
-                session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
+            async with self.driver.session() as session:
+                await session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
             
-            # Sync accounts
-            self.sync_accounts(initial)
-            
-            # Sync follows
-            self.sync_follows(initial)
-            
-            # Switch back to transactional mode
-            with self.driver.session() as session:
-                session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
+            if initial and self.csv_export_dir:
+                # Bulk load through files Memgraph can read directly
+                await self.sync_initial_csv(timestamp=self.run_started_at)
+            else:
+                # Analytical mode has no WAL to flush, so bulk loads can use
+                # much larger batches
+                if initial:
+                    self.batch_size = self.initial_batch_size
+                
+                # Sync accounts
+                await self.sync_accounts(initial, timestamp=self.run_started_at)
+                
+                # Release memory held by the account import before loading follows
+                async with self.driver.session() as session:
+                    await session.run("FREE MEMORY")
+                
+                # Sync follows
+                await self.sync_follows(initial, timestamp=self.run_started_at)
             
-            # Update the overall sync timestamp
-            self.update_sync_timestamp()
+            # Build the indexes skipped for the bulk load
+            if initial:
+                await self.finalize_schema()
             
-            # Print some stats
-            with self.driver.session() as session:
-                # Count users
-                result = session.run("MATCH (u:User) RETURN count(u) as count")
-                user_count = result.single()["count"]
+            async with self.driver.session() as session:
+                # Switch back to transactional mode
+                await session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
                 
-                # Count follow relationships
-                result = session.run("MATCH ()-[r:FOLLOWS]->() RETURN count(r) as count")
-                follow_count = result.single()["count"]
+                # Update the overall sync timestamp
+                await self.update_sync_timestamp(session, self.run_started_at)
                 
-                logger.info(f"Sync completed: {user_count} users, {follow_count} follow relationships")
+                # Print some stats
+                result = await session.run("""
+                    MATCH (u:User)
+                    WITH count(u) AS users
+                    OPTIONAL MATCH ()-[r:FOLLOWS]->()
+                    RETURN users, count(r) AS follows
+                """)
+                record = await result.single()
+                
+                logger.info(f"Sync completed: {record['users']} users, {record['follows']} follow relationships")
             
         except Exception as e:
             logger.error(f"Error during sync: {e}")
@@ -511,25 +815,38 @@ class MemgraphSync:
         finally:
             # Make sure we're back in transactional mode
             try:
-                with self.driver.session() as session:
-                    session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
+                async with self.driver.session() as session:
+                    await session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
             except:
                 pass
 
 
+async def run_sync(initial=False, force=False):
+    """Connect, run one sync and close the connections."""
+    sync = MemgraphSync()
+    
+    try:
+        await sync.connect()
+        await sync.run(initial=initial, force=force)
+    finally:
+        await sync.close()
+
+
 def main():
     """Main entry point."""
-    parser = argparse.ArgumentParser(description='Memgraph Sync using MAGE Migration')
+    parser = argparse.ArgumentParser(description='Sync Supabase data to Memgraph')
     parser.add_argument('--initial', action='store_true', help='Perform initial full sync')
     parser.add_argument('--force', action='store_true', help='Force sync even if recent sync was performed')
     args = parser.parse_args()
     
-    sync = MemgraphSync()
-    
+    # Use uvloop where available for a faster event loop
     try:
-        sync.run(initial=args.initial, force=args.force)
-    finally:
-        sync.close()
+        import uvloop
+        uvloop.install()
+    except ImportError:
+        pass
+    
+    asyncio.run(run_sync(initial=args.initial, force=args.force))
 
 
 if __name__ == "__main__":
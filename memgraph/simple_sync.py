@@ -3,21 +3,27 @@
 Simple Memgraph Synchronization Script
 
 This script syncs bluesky_accounts and follows from Supabase to Memgraph
-using the existing Supabase API client. It's designed to be run periodically
+using Supabase's REST API. It's designed to be run periodically
 to keep the graph database updated with the latest social network data.
+
+Fetching pages from Supabase and writing them to Memgraph run concurrently,
+so neither side sits idle waiting on the other.
 """
 
 import os
 import sys
 import time
+import asyncio
 import logging
-from datetime import datetime, timedelta
+from datetime import datetime, timedelta, timezone
 from typing import Dict, Any, List, Optional
 
+import httpx
 import neo4j
-from neo4j import GraphDatabase
+import orjson
+from neo4j import AsyncGraphDatabase
+from neo4j.exceptions import TransientError
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
 # Load environment variables
 load_dotenv()
@@ -33,6 +39,70 @@ logging.basicConfig(
 )
 logger = logging.getLogger("MemgraphSync")
 
+# Columns fetched from Supabase, named the way the Cypher queries read them
+ACCOUNTS_SELECT = "did,handle,display_name,bio,avatar_url,updated_at:last_updated_at"
+FOLLOWS_SELECT = ("follower_did,following_did,follower_handle,following_handle,"
+                  "created_at,last_verified_at,activity_type,follow_status")
+
+# Memgraph queries. The text never changes between calls, so Memgraph can
+# reuse the cached plan for each of them. The batch writes commit every
+# 10,000 rows on the server, which keeps transaction memory bounded however
+# many rows a single call sends; they must run as auto-commit queries.
+ACCOUNTS_UPSERT_CQL = """
+    UNWIND $accounts AS account
+    CALL {
+        WITH account
+        MERGE (u:User {did: account.did})
+        SET u.handle = account.handle,
+            u.display_name = coalesce(account.display_name, ''),
+            u.bio = coalesce(account.bio, ''),
+            u.avatar_url = coalesce(account.avatar_url, ''),
+            u.updated_at = account.updated_at
+    } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+# The users at both ends of a page's active follows are merged in one pass
+# first, so follows whose accounts haven't been synced yet aren't dropped and
+# the concurrent relationship writes only have to MATCH them
+FOLLOW_USERS_MERGE_CQL = """
+    UNWIND $users AS user
+    CALL {
+        WITH user
+        MERGE (u:User {did: user.did})
+        ON CREATE SET u.handle = user.handle
+    } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+FOLLOWS_UPSERT_CQL = """
+    UNWIND $follows AS follow
+    CALL {
+        WITH follow
+        MATCH (follower:User {did: follow.follower_did})
+        MATCH (following:User {did: follow.following_did})
+        MERGE (follower)-[r:FOLLOWS]->(following)
+        SET r.created_at = follow.created_at,
+            r.last_verified_at = follow.last_verified_at,
+            r.activity_type = follow.activity_type,
+            r.follower_handle = follow.follower_handle,
+            r.following_handle = follow.following_handle
+    } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+UNFOLLOWS_DELETE_CQL = """
+    UNWIND $unfollows AS unfollow
+    CALL {
+        WITH unfollow
+        MATCH (follower:User {did: unfollow.follower_did})
+        -[r:FOLLOWS]->
+        (following:User {did: unfollow.following_did})
+        DELETE r
+    } IN TRANSACTIONS OF 10000 ROWS
+"""
+
+# Logged when Supabase has no table for the sync timestamps
+SYNC_METADATA_MISSING = ("The sync_metadata table doesn't exist in Supabase; "
+                         "apply migrations/03_add_sync_metadata.sql")
+
 class MemgraphSyncSimple:
     """Simple synchronization from Supabase to Memgraph for Bluesky data."""
     
@@ -46,7 +116,17 @@ class MemgraphSyncSimple:
             logger.error("SUPABASE_URL and SUPABASE_KEY must be set in the environment")
             sys.exit(1)
             
-        self.supabase = create_client(supabase_url, supabase_key)
+        # Talk to PostgREST directly rather than through the blocking supabase-py client
+        self.http = httpx.AsyncClient(
+            base_url=f"{supabase_url.rstrip('/')}/rest/v1",
+            headers={
+                'apikey': supabase_key,
+                'Authorization': f'Bearer {supabase_key}'
+            },
+            timeout=60.0,
+            # Bound the requests in flight rather than sleeping between pages
+            limits=httpx.Limits(max_connections=4)
+        )
         logger.info(f"Connected to Supabase at {supabase_url}")
         
         # Memgraph connection
@@ -59,545 +139,602 @@ class MemgraphSyncSimple:
             if memgraph_user and memgraph_password:
                 auth = (memgraph_user, memgraph_password)
                 
-            self.driver = GraphDatabase.driver(memgraph_uri, auth=auth)
+            self.driver = AsyncGraphDatabase.driver(memgraph_uri, auth=auth)
+            
+            # One long-lived session for schema, metadata and stats queries;
+            # batch writes open their own so they can run concurrently
+            self._session = self.driver.session()
             logger.info(f"Connected to Memgraph at {memgraph_uri}")
         except Exception as e:
             logger.error(f"Failed to connect to Memgraph: {e}")
             sys.exit(1)
         
         # Configuration
-        self.batch_size = 500
+        # At most prefetch_pages + 2 write batches are held at once: the
+        # queued ones, the one being written and the one being filled, so
+        # peak memory is about 40,000 rows
+        self.batch_size = 500  # Rows per Supabase page
+        self.write_batch_size = 10_000  # Rows per Memgraph write batch
+        self.write_concurrency = 4  # Memgraph sessions writing a batch at once
+        self.prefetch_pages = 2  # Write batches fetched ahead of the writers
+        self.max_retries = 5  # Attempts at a rate-limited Supabase request
+        self.write_retries = 3  # Attempts at a Memgraph write hitting a transient error
         self.min_sync_interval = timedelta(hours=1)
         self.force_full_sync = force_full_sync
+        self.last_syncs = {}  # Sync type -> ISO timestamp of its last sync
+        self._analytical = False  # Whether we switched Memgraph to analytical mode
     
-    def close(self):
-        """Close the Memgraph connection."""
+    async def close(self):
+        """Close the Supabase and Memgraph connections."""
+        await self.http.aclose()
         if hasattr(self, 'driver'):
-            self.driver.close()
+            await self._session.close()
+            await self.driver.close()
     
-    def setup_schema(self):
-        """Set up the initial schema with constraints and indexes."""
+    async def setup_schema(self):
+        """Set up the constraints the sync's MERGEs rely on."""
         logger.info("Setting up Memgraph schema")
         
-        with self.driver.session() as session:
-            # Switch to analytical mode for better import performance
-            session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
-            
-            # Create constraints for main entity types
-            constraints = [
-                "CREATE CONSTRAINT ON (u:User) ASSERT u.did IS UNIQUE"
-            ]
-            
-            for constraint in constraints:
-                try:
-                    session.run(constraint)
-                    logger.info(f"Created constraint: {constraint}")
-                except Exception as e:
-                    if "already exists" in str(e):
-                        logger.info(f"Constraint already exists: {constraint}")
-                    else:
-                        logger.warning(f"Error creating constraint: {e}")
-            
-            # Create indexes for better query performance
-            indexes = [
-                "CREATE INDEX ON :User(handle)"
-            ]
-            
-            for index in indexes:
-                try:
-                    session.run(index)
-                    logger.info(f"Created index: {index}")
-                except Exception as e:
-                    if "already exists" in str(e):
-                        logger.info(f"Index already exists: {index}")
-                    else:
-                        logger.warning(f"Error creating index: {e}")
+        # Switch to analytical mode for better import performance
+        await self._session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
+        self._analytical = True
+        
+        # Create constraints for main entity types
+        constraints = [
+            "CREATE CONSTRAINT ON (u:User) ASSERT u.did IS UNIQUE"
+        ]
+        
+        for constraint in constraints:
+            try:
+                await self._session.run(constraint)
+                logger.info(f"Created constraint: {constraint}")
+            except Exception as e:
+                if "already exists" in str(e):
+                    logger.info(f"Constraint already exists: {constraint}")
+                else:
+                    logger.warning(f"Error creating constraint: {e}")
     
-    def should_sync(self, sync_type: str) -> bool:
+    async def create_indexes(self):
+        """
+        Create indexes for better query performance.
+        
+        Run after the data is loaded, so Memgraph builds each index in one
+        pass instead of updating it on every MERGE during the import.
+        """
+        indexes = [
+            "CREATE INDEX ON :User(handle)"
+        ]
+        
+        for index in indexes:
+            try:
+                await self._session.run(index)
+                logger.info(f"Created index: {index}")
+            except Exception as e:
+                if "already exists" in str(e):
+                    logger.info(f"Index already exists: {index}")
+                else:
+                    logger.warning(f"Error creating index: {e}")
+    
+    async def should_sync(self, sync_type: str) -> bool:
         """Check if we should sync based on last sync time."""
         # Always sync if force_full_sync is set
         if self.force_full_sync:
             logger.info(f"Forcing full sync for {sync_type}")
             return True
             
-        with self.driver.session() as session:
-            result = session.run(
-                f"MATCH (m:Metadata {{key: 'last_{sync_type}_sync'}}) RETURN m.timestamp as timestamp"
-            )
+        timestamp = self.last_syncs.get(sync_type)
+        if not timestamp:
+            return True
+        
+        try:
+            last_sync = datetime.fromisoformat(timestamp)
+            now = datetime.now(timezone.utc)
             
-            record = result.single()
-            if not record:
-                return True
-                
-            try:
-                last_sync = datetime.fromisoformat(record["timestamp"])
-                now = datetime.now()
+            if now - last_sync < self.min_sync_interval:
+                logger.info(f"Last {sync_type} sync was {now - last_sync} ago, skipping")
+                return False
                 
-                if now - last_sync < self.min_sync_interval:
-                    logger.info(f"Last {sync_type} sync was {now - last_sync} ago, skipping")
-                    return False
-                    
-                return True
-            except Exception as e:
-                logger.warning(f"Error checking last sync time: {e}")
-                return True
+            return True
+        except Exception as e:
+            logger.warning(f"Error checking last sync time: {e}")
+            return True
     
-    def update_sync_timestamp(self, sync_type: str):
+    async def load_sync_timestamps(self):
+        """
+        Load the last sync timestamps from the Supabase sync_metadata table.
+        
+        Keeping them next to the source data means one request over the
+        Supabase connection we already use, instead of Memgraph round trips
+        before the first page is fetched.
+        """
+        try:
+            response = await self._get('/sync_metadata', {'select': 'key,last_sync'})
+        except httpx.HTTPStatusError as e:
+            if not self._is_missing_table(e.response):
+                raise
+            logger.warning(f"{SYNC_METADATA_MISSING}; syncing everything")
+            self.last_syncs = {}
+            return
+        
+        self.last_syncs = {row['key']: row['last_sync'] for row in orjson.loads(response.content)}
+    
+    async def update_sync_timestamp(self, sync_type: str):
         """Update the sync timestamp for a specific type."""
-        timestamp = datetime.now().isoformat()
-        
-        with self.driver.session() as session:
-            session.run(
-                f"""
-                MERGE (m:Metadata {{key: 'last_{sync_type}_sync'}})
-                SET m.timestamp = $timestamp
-                """,
-                {"timestamp": timestamp}
-            )
-            
+        timestamp = datetime.now(timezone.utc).isoformat()
+        
+        response = await self.http.post(
+            '/sync_metadata',
+            json={'key': sync_type, 'last_sync': timestamp},
+            headers={'Prefer': 'resolution=merge-duplicates'}
+        )
+        if self._is_missing_table(response):
+            logger.warning(f"{SYNC_METADATA_MISSING}; the {sync_type} sync timestamp won't be kept")
+        else:
+            response.raise_for_status()
+        self.last_syncs[sync_type] = timestamp
+        
         logger.info(f"Updated {sync_type} sync timestamp to {timestamp}")
     
-    def reset_sync_timestamps(self):
+    async def reset_sync_timestamps(self):
         """Reset all sync timestamps to force a full sync."""
         logger.info("Resetting all sync timestamps")
         
-        with self.driver.session() as session:
-            session.run("MATCH (m:Metadata) DETACH DELETE m")
+        response = await self.http.delete('/sync_metadata', params={'key': 'in.(accounts,follows)'})
+        if self._is_missing_table(response):
+            # Nothing to reset; a full sync doesn't need the timestamps
+            logger.warning(SYNC_METADATA_MISSING)
+        else:
+            response.raise_for_status()
+        self.last_syncs = {}
+    
+    @staticmethod
+    def _is_missing_table(response: httpx.Response) -> bool:
+        """Whether PostgREST rejected the request because its table doesn't exist."""
+        return response.status_code == 404 or b'PGRST205' in response.content
+    
+    async def get_node_count(self):
+        """
+        Get current node and relationship counts from Memgraph.
+        
+        Reads the counters Memgraph maintains instead of scanning the graph.
+        These are whole-graph totals: they include nodes the sync doesn't
+        write, such as the Metadata nodes mage_sync.py and
+        supabase_to_memgraph.py keep in the same instance, so they are close
+        to but not exactly the User and FOLLOWS counts.
+        """
+        result = await self._session.run("SHOW STORAGE INFO")
+        info = {record["storage info"]: record["value"] for record in await result.data()}
+        
+        return info["vertex_count"], info["edge_count"]
+    
+    async def _count_rows(self, table: str, params: Dict[str, str]) -> int:
+        """
+        Estimate the rows of a Supabase table or view matching the filters.
+        
+        The total only drives progress logging, so we ask PostgREST for its
+        planner estimate rather than an exact COUNT(*) over the whole table.
+        """
+        response = await self.http.head(
+            f"/{table}",
+            params=params,
+            headers={'Prefer': 'count=estimated'}
+        )
+        response.raise_for_status()
+        
+        # PostgREST reports the total in the Content-Range header, e.g. "0-499/1234"
+        total = response.headers.get('content-range', '*/0').rsplit('/', 1)[-1]
+        return int(total) if total.isdigit() else 0
+    
+    @staticmethod
+    def _keyset_filter(columns: List[str], values: List[Any]) -> str:
+        """
+        Build a PostgREST filter for rows sorting after the given key.
+        
+        For columns (a, b) and values (x, y) this is
+        ``or(a.gt."x",and(a.eq."x",b.gt."y"))``.
+        """
+        terms = []
+        for i, column in enumerate(columns):
+            conditions = [f'{c}.eq."{v}"' for c, v in zip(columns[:i], values[:i])]
+            conditions.append(f'{column}.gt."{values[i]}"')
+            terms.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+        
+        return f"or({','.join(terms)})"
     
-    def get_node_count(self):
-        """Get current node count from Memgraph."""
-        with self.driver.session() as session:
-            result = session.run("MATCH (u:User) RETURN count(u) as user_count")
-            user_count = result.single()["user_count"]
+    async def _get(self, path: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        GET a PostgREST resource, backing off when Supabase rate limits us.
+        
+        A 429 is retried with exponential backoff, honouring Retry-After
+        when the server sends it; any other error is raised.
+        """
+        for attempt in range(self.max_retries):
+            response = await self.http.get(path, params=params)
+            if response.status_code != 429 or attempt == self.max_retries - 1:
+                break
+            
+            retry_after = response.headers.get('retry-after', '')
+            delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+            logger.warning(f"Rate limited by Supabase, retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+        
+        response.raise_for_status()
+        return response
+    
+    async def _fetch_pages(self, table: str, params: Dict[str, str], key_columns: List[str]):
+        """
+        Page through a Supabase table or view using keyset pagination.
+        
+        Each page continues after the last row of the previous page in
+        key_columns order, so every request is an index range scan instead
+        of an OFFSET that re-reads all earlier rows.
+        
+        Args:
+            table: Table or view name
+            params: PostgREST select and filter parameters
+            key_columns: Columns that uniquely identify and order a row
+        
+        Yields:
+            list: Rows of each non-empty page
+        """
+        cursor = None
+        
+        while True:
+            page_params = {**params, 'order': ','.join(key_columns), 'limit': self.batch_size}
+            if cursor:
+                page_params['and'] = f"({self._keyset_filter(key_columns, cursor)})"
+            
+            response = await self._get(f"/{table}", page_params)
+            # orjson decodes large pages several times faster than the stdlib
+            page = orjson.loads(response.content)
+            
+            logger.info(f"Fetched {len(page)} rows from {table}")
+            
+            # A short page means we've reached the end
+            has_more = len(page) == self.batch_size
+            if has_more:
+                cursor = [page[-1][column] for column in key_columns]
             
-            result = session.run("MATCH ()-[r:FOLLOWS]->() RETURN count(r) as follow_count")
-            follow_count = result.single()["follow_count"]
+            if page:
+                yield page
+            
+            if not has_more:
+                break
+    
+    async def _rebatch(self, pages):
+        """
+        Regroup fetched pages into write_batch_size chunks.
+        
+        Supabase pages are kept small, but Memgraph commits the writes in
+        chunks itself, so buffering many pages into one call saves round trips.
+        
+        Args:
+            pages: Async iterator of pages
+        
+        Yields:
+            list: Up to write_batch_size rows
+        """
+        buffer = []
+        
+        async for page in pages:
+            buffer.extend(page)
+            if len(buffer) >= self.write_batch_size:
+                yield buffer
+                buffer = []
+        
+        if buffer:
+            yield buffer
+    
+    def _partition(self, rows: List[Dict[str, Any]], key: str) -> List[List[Dict[str, Any]]]:
+        """
+        Split rows into write_concurrency buckets by the hash of a key column.
+        
+        Rows sharing a key always land in the same bucket. Account buckets
+        therefore write disjoint nodes; follow buckets, keyed on the follower,
+        write disjoint followers, but share the users they follow, which is
+        why those are merged before the buckets are written.
+        """
+        buckets = [[] for _ in range(self.write_concurrency)]
+        for row in rows:
+            buckets[hash(row[key]) % self.write_concurrency].append(row)
+        
+        return [bucket for bucket in buckets if bucket]
+    
+    async def _pipeline(self, pages, write_page):
+        """
+        Write pages to Memgraph while the next pages are being fetched.
+        
+        A producer task pulls pages into a small queue. Pages are written one
+        at a time: write_page fans each page out over write_concurrency
+        sessions itself, and writing the next page alongside would put rows
+        for the same nodes, such as a follower straddling two pages, in
+        concurrent sessions.
+        
+        Args:
+            pages: Async iterator of pages
+            write_page: Coroutine function that writes one page
+        """
+        queue = asyncio.Queue(maxsize=self.prefetch_pages)
+        
+        async def produce():
+            # The end sentinel is only sent on exhaustion or error. When the
+            # consumer cancels us it has stopped reading, and a put into a
+            # full queue would block forever
+            try:
+                async for page in pages:
+                    await queue.put(page)
+            except Exception:
+                await queue.put(None)
+                raise
+            await queue.put(None)
+        
+        producer = asyncio.create_task(produce())
+        
+        try:
+            while (page := await queue.get()) is not None:
+                await write_page(page)
             
-            return user_count, follow_count
+            # Surface any error raised while fetching
+            await producer
+        finally:
+            producer.cancel()
     
-    def sync_accounts(self):
+    async def sync_accounts(self):
         """Sync Bluesky accounts from Supabase to Memgraph."""
-        if not self.should_sync("accounts"):
+        if not await self.should_sync("accounts"):
             return
             
         logger.info("Starting accounts sync")
-        initial_count, _ = self.get_node_count()
-        logger.info(f"Starting with {initial_count} user nodes")
+        initial_count, _ = await self.get_node_count()
+        logger.info(f"Starting with {initial_count} nodes in the graph")
         
         try:
             # Get the timestamp of the last sync
-            last_sync = None
-            if not self.force_full_sync:
-                with self.driver.session() as session:
-                    result = session.run(
-                        "MATCH (m:Metadata {key: 'last_accounts_sync'}) RETURN m.timestamp as timestamp"
-                    )
-                    
-                    record = result.single()
-                    if record and record["timestamp"]:
-                        last_sync = record["timestamp"]
-                        logger.info(f"Syncing accounts updated since {last_sync}")
+            last_sync = self.last_syncs.get("accounts")
+            if last_sync:
+                logger.info(f"Syncing accounts updated since {last_sync}")
+            
+            filters = {}
+            if last_sync:
+                filters['last_updated_at'] = f"gt.{last_sync}"
+            
+            # First, get an estimate of how many accounts there are
+            total_expected = await self._count_rows('bluesky_accounts', filters)
+            logger.info(f"Found about {total_expected} accounts to sync")
             
             # Full sync approach - paginate through all accounts
             total_accounts = 0
-            offset = 0
-            has_more = True
             total_batches_processed = 0
             
-            # First, get a count of all accounts
-            count_query = self.supabase.table('bluesky_accounts').select('count', count='exact')
-            if last_sync:
-                count_query = count_query.gt('last_updated_at', last_sync)
-            count_response = count_query.execute()
-            total_expected = count_response.count
-            logger.info(f"Found {total_expected} total accounts to sync")
-            
-            # Process accounts in batches
-            while has_more:
+            async def write_page(accounts_batch):
+                nonlocal total_accounts, total_batches_processed
                 start_time = time.time()
                 
-                # Fetch a batch of accounts with pagination
-                query = self.supabase.table('bluesky_accounts').select('*')
-                if last_sync:
-                    query = query.gt('last_updated_at', last_sync)
-                query = query.range(offset, offset + self.batch_size - 1)
-                
-                # Execute the query
-                response = query.execute()
-                accounts_batch = response.data
-                batch_size = len(accounts_batch)
-                
-                logger.info(f"Fetched {batch_size} accounts (offset: {offset})")
-                total_accounts += batch_size
-                
-                # Process this batch
-                if batch_size > 0:
-                    batch_result = self._process_accounts_batch(accounts_batch)
-                    total_batches_processed += 1
+                # Write disjoint sets of accounts over concurrent sessions
+                results = await asyncio.gather(*(
+                    self._process_accounts_batch(bucket) for bucket in self._partition(accounts_batch, 'did')
+                ))
+                batch_result = sum(results)
+                total_accounts += len(accounts_batch)
+                total_batches_processed += 1
                     
-                    # Logging for monitoring progress
-                    elapsed = time.time() - start_time
-                    current_count, _ = self.get_node_count()
-                    logger.info(f"Batch {total_batches_processed}: {batch_result} accounts processed in {elapsed:.2f}s. Total nodes: {current_count}")
+                # Logging for monitoring progress
+                elapsed = time.time() - start_time
+                logger.info(f"Batch {total_batches_processed}: {batch_result} accounts processed in {elapsed:.2f}s")
                     
-                    # Calculate progress percentage
-                    progress = (total_accounts / total_expected) * 100 if total_expected > 0 else 0
-                    logger.info(f"Progress: {progress:.1f}% ({total_accounts}/{total_expected})")
+                # Calculate progress percentage
+                progress = (total_accounts / total_expected) * 100 if total_expected > 0 else 0
+                logger.info(f"Progress: {progress:.1f}% ({total_accounts}/{total_expected})")
                 
-                # Check if there are more accounts to fetch
-                has_more = batch_size == self.batch_size
-                offset += self.batch_size
-                
-                # Add a small delay to avoid overwhelming the Supabase API
-                if has_more:
-                    time.sleep(0.2)
+            await self._pipeline(
+                self._rebatch(self._fetch_pages('bluesky_accounts', {'select': ACCOUNTS_SELECT, **filters}, ['did'])),
+                write_page
+            )
             
             # Final count check
-            final_count, _ = self.get_node_count()
+            final_count, _ = await self.get_node_count()
             logger.info(f"Completed full sync of {total_accounts} accounts. Nodes before: {initial_count}, after: {final_count}")
             
             # Update the sync timestamp
-            self.update_sync_timestamp("accounts")
+            await self.update_sync_timestamp("accounts")
             
         except Exception as e:
             logger.error(f"Error syncing accounts: {e}")
             import traceback
             logger.error(traceback.format_exc())
     
-    def _process_accounts_batch(self, accounts):
+    async def _run_write(self, query: str, **params) -> neo4j.ResultSummary:
+        """
+        Run a batch write as an auto-commit query in its own session.
+        
+        The queries commit in chunks with CALL ... IN TRANSACTIONS, which
+        Memgraph only allows outside an explicit transaction, so the driver's
+        managed retries don't apply. Transient errors, such as conflicting
+        concurrent writes, are retried here with a short backoff instead.
+        Re-running a query whose earlier chunks already committed is safe,
+        since the queries only MERGE and DELETE.
+        """
+        for attempt in range(1, self.write_retries + 1):
+            try:
+                async with self.driver.session() as session:
+                    result = await session.run(query, **params)
+                    return await result.consume()
+            except TransientError as e:
+                if attempt == self.write_retries:
+                    raise
+                logger.warning(f"Transient error writing batch (attempt {attempt}): {e}")
+                await asyncio.sleep(0.1 * 2 ** attempt)
+    
+    async def _process_accounts_batch(self, accounts):
         """Process a batch of accounts and update Memgraph."""
         if not accounts:
             return 0
             
-        batch_accounts = []
-        
-        # Prepare batch data
-        for account in accounts:
-            batch_accounts.append({
-                'did': account.get('did'),
-                'handle': account.get('handle'),
-                'display_name': account.get('display_name') or '',
-                'bio': account.get('bio') or '',
-                'avatar_url': account.get('avatar_url') or '',
-                'updated_at': account.get('last_updated_at')
-            })
-        
         # Update Memgraph - Use MERGE instead of MATCH to handle both creation and updates
         try:
-            with self.driver.session() as session:
-                result = session.run(
-                    """
-                    UNWIND $accounts AS account
-                    MERGE (u:User {did: account.did})
-                    SET u.handle = account.handle,
-                        u.display_name = account.display_name,
-                        u.bio = account.bio,
-                        u.avatar_url = account.avatar_url,
-                        u.updated_at = account.updated_at
-                    RETURN count(*) as updated
-                    """,
-                    {"accounts": batch_accounts}
-                )
-                
-                updated = result.single()["updated"]
-                logger.info(f"Updated {updated} accounts in Memgraph")
-                return updated
+            summary = await self._run_write(ACCOUNTS_UPSERT_CQL, accounts=accounts)
+            
+            logger.info(f"Updated {len(accounts)} accounts in Memgraph ({summary.counters.nodes_created} new)")
+            return len(accounts)
         except Exception as e:
+            # Fail the sync, so its timestamp isn't advanced past these accounts
             logger.error(f"Error processing accounts batch: {e}")
-            logger.error(f"First account in batch: {batch_accounts[0] if batch_accounts else 'None'}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return 0
+            logger.error(f"First account in batch: {accounts[0] if accounts else 'None'}")
+            raise
     
-    def sync_follows(self):
+    async def sync_follows(self):
         """Sync follow relationships from Supabase to Memgraph."""
-        if not self.should_sync("follows"):
+        if not await self.should_sync("follows"):
             return
             
         logger.info("Starting follows sync")
-        _, initial_follows = self.get_node_count()
-        logger.info(f"Starting with {initial_follows} follow relationships")
+        _, initial_follows = await self.get_node_count()
+        logger.info(f"Starting with {initial_follows} relationships in the graph")
         
         try:
-            # Create an index to store all DIDs we've already processed
-            # This helps us track which users exist in the database
-            user_dids = set()
-            with self.driver.session() as session:
-                # Get all existing DIDs from the database
-                result = session.run(
-                    """
-                    MATCH (u:User) 
-                    RETURN collect(u.did) as dids
-                    """
-                )
-                dids_from_db = result.single()["dids"]
-                user_dids.update(dids_from_db)
-                logger.info(f"Found {len(user_dids)} existing users in Memgraph")
-                
             # Get the timestamp of the last sync
-            last_sync = None
-            if not self.force_full_sync:
-                with self.driver.session() as session:
-                    result = session.run(
-                        "MATCH (m:Metadata {key: 'last_follows_sync'}) RETURN m.timestamp as timestamp"
-                    )
-                    
-                    record = result.single()
-                    if record and record["timestamp"]:
-                        last_sync = record["timestamp"]
-                        logger.info(f"Syncing follows updated since {last_sync}")
+            last_sync = self.last_syncs.get("follows")
+            if last_sync:
+                logger.info(f"Syncing follows updated since {last_sync}")
+            
+            # If we have a last sync, only get active follows and unfollows after that time
+            filters = {}
+            if last_sync:
+                filters['or'] = f"(follow_status.eq.active,unfollowed_at.gt.\"{last_sync}\")"
+            
+            # First, get an estimate of how many follows there are
+            total_expected = await self._count_rows('follow_activity', filters)
+            logger.info(f"Found about {total_expected} follows to sync")
             
             # Process all the follow activity
             total_follows = 0
-            offset = 0
-            has_more = True
             total_batches_processed = 0
             
-            # First, get a count of all follows
-            count_query = self.supabase.from_('follow_activity').select('count', count='exact')
-            if last_sync:
-                count_query = count_query.or_(f"follow_status.eq.active,unfollowed_at.gt.{last_sync}")
-            count_response = count_query.execute()
-            total_expected = count_response.count
-            logger.info(f"Found {total_expected} total follows to sync")
-
-            # Process follows in batches
-            while has_more:
+            async def write_page(follows_batch):
+                nonlocal total_follows, total_batches_processed
                 start_time = time.time()
                 
-                # Fetch a batch of follows from the view
-                query = self.supabase.from_('follow_activity').select('*')
-                
-                # If we have a last sync, only get active follows and unfollows after that time
-                if last_sync:
-                    query = query.or_(f"follow_status.eq.active,unfollowed_at.gt.{last_sync}")
-                    
-                # Add pagination
-                query = query.range(offset, offset + self.batch_size - 1)
-                
-                # Execute the query
-                response = query.execute()
-                follows_batch = response.data
-                batch_size = len(follows_batch)
-                
-                logger.info(f"Fetched {batch_size} follow activities (offset: {offset})")
-                total_follows += batch_size
-                
-                # Process this batch
-                if batch_size > 0:
-                    # First ensure all users exist
-                    missing_users = self._ensure_users_exist(follows_batch, user_dids)
-                    # Then create the relationships
-                    batch_result = self._process_follow_activity_batch(follows_batch)
-                    total_batches_processed += 1
+                # Create any users the follows reference, then the relationships,
+                # sharding by follower so concurrent sessions don't write the
+                # same follower
+                await self._merge_follow_users(follows_batch)
+                results = await asyncio.gather(*(
+                    self._process_follow_activity_batch(bucket) for bucket in self._partition(follows_batch, 'follower_did')
+                ))
+                batch_result = sum(results)
+                total_follows += len(follows_batch)
+                total_batches_processed += 1
                     
-                    # Logging for monitoring progress
-                    elapsed = time.time() - start_time
-                    _, current_follows = self.get_node_count()
-                    logger.info(f"Batch {total_batches_processed}: Created {missing_users} missing users, {batch_result} follows processed in {elapsed:.2f}s. Total relationships: {current_follows}")
+                # Logging for monitoring progress
+                elapsed = time.time() - start_time
+                logger.info(f"Batch {total_batches_processed}: {batch_result} follows processed in {elapsed:.2f}s")
                     
-                    # Calculate progress percentage
-                    progress = (total_follows / total_expected) * 100 if total_expected > 0 else 0
-                    logger.info(f"Progress: {progress:.1f}% ({total_follows}/{total_expected})")
+                # Calculate progress percentage
+                progress = (total_follows / total_expected) * 100 if total_expected > 0 else 0
+                logger.info(f"Progress: {progress:.1f}% ({total_follows}/{total_expected})")
                 
-                # Check if there are more follows to fetch
-                has_more = batch_size == self.batch_size
-                offset += self.batch_size
-                
-                # Add a small delay to avoid overwhelming the Supabase API
-                if has_more:
-                    time.sleep(0.2)
+            await self._pipeline(
+                self._rebatch(self._fetch_pages('follow_activity', {'select': FOLLOWS_SELECT, **filters}, ['follower_did', 'following_did'])),
+                write_page
+            )
             
             # Final count check
-            _, final_follows = self.get_node_count()
+            _, final_follows = await self.get_node_count()
             logger.info(f"Completed sync of {total_follows} follow activities. Relationships before: {initial_follows}, after: {final_follows}")
             
             # Update the sync timestamp
-            self.update_sync_timestamp("follows")
+            await self.update_sync_timestamp("follows")
             
         except Exception as e:
             logger.error(f"Error syncing follows: {e}")
             import traceback
             logger.error(traceback.format_exc())
     
-    def _ensure_users_exist(self, follows, existing_dids):
-        """Ensure all users from the follows batch exist in Memgraph."""
-        # Extract user information
-        users_to_create = []
+    async def _merge_follow_users(self, follows):
+        """Create the users at either end of the active follows that don't exist yet."""
+        users = {}
         for follow in follows:
-            # Extract follower
-            follower_did = follow.get('follower_did')
-            if follower_did and follower_did not in existing_dids:
-                users_to_create.append({
-                    'did': follower_did,
-                    'handle': follow.get('follower_handle')
-                })
-                existing_dids.add(follower_did)
-            
-            # Extract following
-            following_did = follow.get('following_did')
-            if following_did and following_did not in existing_dids:
-                users_to_create.append({
-                    'did': following_did,
-                    'handle': follow.get('following_handle')
-                })
-                existing_dids.add(following_did)
-        
-        # Create any missing users
-        if users_to_create:
-            logger.info(f"Creating {len(users_to_create)} missing users")
-            
-            try:
-                with self.driver.session() as session:
-                    result = session.run(
-                        """
-                        UNWIND $users AS user
-                        MERGE (u:User {did: user.did})
-                        SET u.handle = user.handle
-                        RETURN count(*) as created
-                        """,
-                        {"users": users_to_create}
-                    )
-                    created = result.single()["created"]
-                    return created
-            except Exception as e:
-                logger.error(f"Error creating missing users: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
-                return 0
+            if follow['follow_status'] == 'active':
+                users.setdefault(follow['follower_did'], follow['follower_handle'])
+                users.setdefault(follow['following_did'], follow['following_handle'])
         
-        return 0
+        if not users:
+            return
+        
+        summary = await self._run_write(
+            FOLLOW_USERS_MERGE_CQL,
+            users=[{'did': did, 'handle': handle} for did, handle in users.items()]
+        )
+        
+        logger.info(f"Merged {len(users)} follow endpoints ({summary.counters.nodes_created} new users)")
     
-    def _process_follow_activity_batch(self, follows):
+    async def _process_follow_activity_batch(self, follows):
         """Process a batch of follow activities and update Memgraph."""
         if not follows:
             return 0
             
-        # Group follows by status
-        active_follows = []
-        unfollows = []
-        
-        # Prepare data for active follows and unfollows
-        for follow in follows:
-            follow_status = follow.get('follow_status')
-            
-            # Get common properties
-            follow_data = {
-                'follower_did': follow.get('follower_did'),
-                'following_did': follow.get('following_did'),
-                'follower_handle': follow.get('follower_handle', ''),
-                'following_handle': follow.get('following_handle', ''),
-                'created_at': follow.get('created_at'),
-                'last_verified_at': follow.get('last_verified_at'),
-                'activity_type': follow.get('activity_type')
-            }
-            
-            if follow_status == 'active':
-                active_follows.append(follow_data)
-            else:
-                unfollows.append(follow_data)
-        
-        # Process active follows - using MERGE instead of MATCH to ensure relationships are created
-        active_count = 0
-        if active_follows:
-            try:
-                with self.driver.session() as session:
-                    result = session.run(
-                        """
-                        UNWIND $follows AS follow
-                        MATCH (follower:User {did: follow.follower_did})
-                        MATCH (following:User {did: follow.following_did})
-                        MERGE (follower)-[r:FOLLOWS]->(following)
-                        SET r.created_at = follow.created_at,
-                            r.last_verified_at = follow.last_verified_at,
-                            r.activity_type = follow.activity_type,
-                            r.follower_handle = follow.follower_handle,
-                            r.following_handle = follow.following_handle
-                        RETURN count(*) as updated
-                        """,
-                        {"follows": active_follows}
-                    )
-                    
-                    active_count = result.single()["updated"]
-                    logger.info(f"Updated {active_count} active follows in Memgraph")
-            except Exception as e:
-                logger.error(f"Error processing active follows: {e}")
-                logger.error(f"First follow in batch: {active_follows[0] if active_follows else 'None'}")
-                import traceback
-                logger.error(traceback.format_exc())
-        
-        # Process unfollows
-        unfollow_count = 0
-        if unfollows:
-            try:
-                with self.driver.session() as session:
-                    result = session.run(
-                        """
-                        UNWIND $unfollows AS unfollow
-                        MATCH (follower:User {did: unfollow.follower_did})
-                        -[r:FOLLOWS]->
-                        (following:User {did: unfollow.following_did})
-                        DELETE r
-                        RETURN count(*) as deleted
-                        """,
-                        {"unfollows": unfollows}
-                    )
-                    
-                    unfollow_count = result.single()["deleted"] 
-                    logger.info(f"Deleted {unfollow_count} unfollows in Memgraph")
-            except Exception as e:
-                logger.error(f"Error processing unfollows: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
+        # Group follows by status; the rows already carry the fields the
+        # queries read, so they're passed as-is
+        active_follows = [follow for follow in follows if follow['follow_status'] == 'active']
+        unfollows = [follow for follow in follows if follow['follow_status'] != 'active']
         
-        return active_count + unfollow_count
+        # Write the follows and unfollows; each query commits as it goes
+        try:
+            created = 0
+            if active_follows:
+                summary = await self._run_write(FOLLOWS_UPSERT_CQL, follows=active_follows)
+                created = summary.counters.relationships_created
+            
+            deleted = 0
+            if unfollows:
+                summary = await self._run_write(UNFOLLOWS_DELETE_CQL, unfollows=unfollows)
+                deleted = summary.counters.relationships_deleted
+
+            logger.info(f"Updated {len(active_follows)} active follows in Memgraph ({created} new)")
+            logger.info(f"Deleted {deleted} unfollows in Memgraph")
+            return len(active_follows) + deleted
+        except Exception as e:
+            # Fail the sync, so its timestamp isn't advanced past these follows
+            logger.error(f"Error processing follow activity: {e}")
+            logger.error(f"First follow in batch: {follows[0]}")
+            raise
     
-    def run(self):
+    async def run(self):
         """Run the synchronization process."""
         try:
             start_time = time.time()
             logger.info("Starting Memgraph sync process")
             
             if self.force_full_sync:
-                self.reset_sync_timestamps()
-            
-            # Set up schema
-            self.setup_schema()
-            
-            # Switch to analytical mode for better import performance
-            with self.driver.session() as session:
-                session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
+                await self.reset_sync_timestamps()
+            else:
+                await self.load_sync_timestamps()
             
+            # Set up schema, switching to analytical mode for the import
+            await self.setup_schema()
+
             # First sync all user accounts
             account_sync_start = time.time()
-            self.sync_accounts()
+            await self.sync_accounts()
             account_sync_time = time.time() - account_sync_start
             logger.info(f"Account sync completed in {account_sync_time:.2f} seconds")
             
             # Then sync all follow relationships
             follow_sync_start = time.time()
-            self.sync_follows()
+            await self.sync_follows()
             follow_sync_time = time.time() - follow_sync_start
             logger.info(f"Follow sync completed in {follow_sync_time:.2f} seconds")
             
-            # Switch back to transactional mode
-            with self.driver.session() as session:
-                session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
-            
+            # Index the loaded data
+            await self.create_indexes()
+
             # Print some stats
-            with self.driver.session() as session:
-                # Count users
-                result = session.run("MATCH (u:User) RETURN count(u) as count")
-                user_count = result.single()["count"]
-                
-                # Count follow relationships
-                result = session.run("MATCH ()-[r:FOLLOWS]->() RETURN count(r) as count")
-                follow_count = result.single()["count"]
-                
-                # Total execution time
-                total_time = time.time() - start_time
-                
-                logger.info(f"Sync completed in {total_time:.2f} seconds: {user_count} users, {follow_count} follow relationships")
+            node_count, relationship_count = await self.get_node_count()
+
+            # Total execution time
+            total_time = time.time() - start_time
+            
+            logger.info(f"Sync completed in {total_time:.2f} seconds: graph has {node_count} nodes, {relationship_count} relationships")
             
         except Exception as e:
             logger.error(f"Error during sync: {e}")
@@ -605,21 +742,26 @@ class MemgraphSyncSimple:
             logger.error(traceback.format_exc())
         
         finally:
-            # Make sure we're back in transactional mode
-            try:
-                with self.driver.session() as session:
-                    session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
-            except:
-                pass
+            # Switch back to transactional mode, whether or not the sync succeeded
+            if self._analytical:
+                try:
+                    await self._session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
+                    self._analytical = False
+                except:
+                    pass
 
-def main():
-    """Main entry point."""
+async def run_sync():
+    """Run one full sync and close the connections."""
     sync = MemgraphSyncSimple(force_full_sync=True)
     
     try:
-        sync.run()
+        await sync.run()
     finally:
-        sync.close()
+        await sync.close()
+
+def main():
+    """Main entry point."""
+    asyncio.run(run_sync())
 
 if __name__ == "__main__":
     main()
@@ -2,21 +2,30 @@
 """
 Supabase to Memgraph Migration Tool
 
-This script uses the Supabase Python client and the Neo4j Python driver (compatible with Memgraph)
+This script uses Supabase's REST API and the async Neo4j Python driver (compatible with Memgraph)
 to efficiently migrate data from a Supabase PostgreSQL database to a Memgraph graph database.
+
+Fetching pages from Supabase and writing them to Memgraph run concurrently
+on one event loop, so neither side sits idle waiting on the other.
 """
 
 import os
 import sys
 import time
+import csv
+import gzip
+import gc
+import asyncio
+import hashlib
 import logging
 from datetime import datetime, timedelta
 from typing import Dict, Any, List, Optional, Set, Tuple
 
+import httpx
 import neo4j
-from neo4j import GraphDatabase
+import orjson
+from neo4j import AsyncGraphDatabase
 from dotenv import load_dotenv
-from supabase import create_client, Client
 
 # Load environment variables
 load_dotenv()
@@ -32,6 +41,60 @@ logging.basicConfig(
 )
 logger = logging.getLogger("SupabaseToMemgraph")
 
+# Memgraph queries. The text never changes between batches, so Memgraph can
+# reuse the cached plan for each of them instead of parsing it again.
+ACCOUNTS_UPSERT_CQL = """
+    UNWIND range(0, size($did) - 1) AS i
+    MERGE (u:User {did: $did[i]})
+    WITH u, i
+    WHERE u.h IS NULL OR u.h <> $h[i]
+    SET u.handle = $handle[i],
+        u.display_name = $display_name[i],
+        u.bio = $bio[i],
+        u.avatar_url = $avatar_url[i],
+        u.updated_at = $updated_at[i],
+        u.h = $h[i]
+"""
+
+# The users at both ends of a batch's follows are merged in one pass first,
+# so the concurrent shards of relationships only have to MATCH them
+FOLLOW_USERS_MERGE_CQL = """
+    UNWIND $users AS user
+    MERGE (u:User {did: user.did})
+    ON CREATE SET u.handle = user.handle
+"""
+
+FOLLOWS_UPSERT_CQL = """
+    UNWIND $follows AS follow
+    MATCH (follower:User {did: follow.follower_did})
+    MATCH (following:User {did: follow.following_did})
+    MERGE (follower)-[r:FOLLOWS]->(following)
+    SET r.created_at = follow.created_at,
+        r.last_verified_at = follow.last_verified_at,
+        r.activity_type = follow.activity_type,
+        r.follower_handle = follow.follower_handle,
+        r.following_handle = follow.following_handle
+"""
+
+# The graph is empty and DIDs are unique, so CREATE needs no lookups
+ACCOUNTS_LOAD_CSV_CQL = """
+    LOAD CSV FROM '{path}' WITH HEADER NULLIF '' AS row
+    CREATE (:User {{
+        did: row.did,
+        handle: row.handle,
+        display_name: coalesce(row.display_name, ''),
+        bio: coalesce(row.bio, ''),
+        avatar_url: coalesce(row.avatar_url, ''),
+        updated_at: row.updated_at,
+        h: toInteger(row.h)
+    }})
+"""
+
+SYNC_TIMESTAMP_CQL = """
+    MERGE (m:Metadata {key: $key})
+    SET m.timestamp = $timestamp
+"""
+
 class SupabaseToMemgraph:
     """Tool to migrate data from Supabase to Memgraph."""
     
@@ -45,7 +108,15 @@ class SupabaseToMemgraph:
             logger.error("SUPABASE_URL and SUPABASE_KEY must be set in the environment")
             sys.exit(1)
             
-        self.supabase = create_client(self.supabase_url, self.supabase_key)
+        # Talk to PostgREST directly rather than through the blocking supabase-py client
+        self.http = httpx.AsyncClient(
+            base_url=f"{self.supabase_url.rstrip('/')}/rest/v1",
+            headers={
+                'apikey': self.supabase_key,
+                'Authorization': f'Bearer {self.supabase_key}'
+            },
+            timeout=60.0
+        )
         logger.info(f"Connected to Supabase at {self.supabase_url}")
         
         # Memgraph connection
@@ -58,30 +129,42 @@ class SupabaseToMemgraph:
             if self.memgraph_user and self.memgraph_password:
                 auth = (self.memgraph_user, self.memgraph_password)
                 
-            self.driver = GraphDatabase.driver(self.memgraph_uri, auth=auth)
+            self.driver = AsyncGraphDatabase.driver(self.memgraph_uri, auth=auth)
             logger.info(f"Connected to Memgraph at {self.memgraph_uri}")
         except Exception as e:
             logger.error(f"Failed to connect to Memgraph: {e}")
             sys.exit(1)
         
         # Configuration
-        self.batch_size = 500
+        self.page_size = 1000  # Rows per Supabase request, the API's maximum
+        self.batch_size = 5000  # Rows per Memgraph write, tuned to the row size
+        self.max_batch_bytes = 8_000_000  # Target UNWIND payload size
+        self.prefetch_pages = 2  # Pages fetched ahead of the Memgraph writes
+        self.write_workers = 8  # Concurrent Memgraph sessions per batch
+        self.max_retries = 5  # Attempts at a rate-limited Supabase request
+        self.gc_interval = 50  # Batches between garbage collections
+        self._idle_sessions = []  # Write sessions kept open between batches
         self.force_full_sync = force_full_sync
         self.timeout = 300  # Timeout for Memgraph operations in seconds
+        
+        # Directory shared with Memgraph for LOAD CSV on full syncs: where
+        # this script writes the exports, and where Memgraph sees them
+        self.csv_export_dir = os.getenv("MEMGRAPH_IMPORT_DIR", "")
+        self.csv_import_path = os.getenv("MEMGRAPH_IMPORT_PATH", self.csv_export_dir)
     
-    def close(self):
+    async def close(self):
         """Close connections."""
+        await self.http.aclose()
+        for session in self._idle_sessions:
+            await session.close()
         if hasattr(self, 'driver'):
-            self.driver.close()
+            await self.driver.close()
     
-    def setup_schema(self):
-        """Set up the Memgraph schema with constraints and indexes."""
-        logger.info("Setting up Memgraph schema")
+    async def setup_constraints(self):
+        """Set up the constraints the migration's MERGEs rely on."""
+        logger.info("Setting up Memgraph constraints")
         
-        with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-            # Switch to analytical mode for better import performance
-            session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
-            
+        async with self._session() as session:
             # Create constraints for main entity types
             constraints = [
                 "CREATE CONSTRAINT ON (u:User) ASSERT u.did IS UNIQUE"
@@ -89,22 +172,31 @@ class SupabaseToMemgraph:
             
             for constraint in constraints:
                 try:
-                    session.run(constraint)
+                    await session.run(constraint)
                     logger.info(f"Created constraint: {constraint}")
                 except Exception as e:
                     if "already exists" in str(e):
                         logger.info(f"Constraint already exists: {constraint}")
                     else:
                         logger.warning(f"Error creating constraint: {e}")
-            
-            # Create indexes for better query performance
+    
+    async def create_indexes(self):
+        """
+        Create indexes for better query performance.
+        
+        Run once the data is loaded, so the bulk MERGEs don't pay for an
+        index update on every row.
+        """
+        logger.info("Creating Memgraph indexes")
+        
+        async with self._session() as session:
             indexes = [
                 "CREATE INDEX ON :User(handle)"
             ]
             
             for index in indexes:
                 try:
-                    session.run(index)
+                    await session.run(index)
                     logger.info(f"Created index: {index}")
                 except Exception as e:
                     if "already exists" in str(e):
@@ -112,274 +204,442 @@ class SupabaseToMemgraph:
                     else:
                         logger.warning(f"Error creating index: {e}")
     
-    def reset_sync_timestamps(self):
+    async def reset_sync_timestamps(self):
         """Reset all sync timestamps in Memgraph."""
         logger.info("Resetting sync timestamps")
         
-        with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-            session.run("MATCH (m:Metadata) DETACH DELETE m")
+        async with self._session() as session:
+            await session.run("MATCH (m:Metadata) DETACH DELETE m")
+    
+    def _session(self):
+        """Open a Memgraph session with the migration's settings."""
+        return self.driver.session(database="", max_transaction_retry_time=self.timeout)
+    
+    async def _write(self, query: str, params: Dict[str, Any]):
+        """
+        Run a write query in its own transaction and return its summary.
+        
+        Sessions can't run two transactions at once, so each concurrent
+        write borrows an idle session and returns it afterwards instead of
+        opening a new one per batch.
+        """
+        session = self._idle_sessions.pop() if self._idle_sessions else self._session()
+        
+        async def work(tx):
+            result = await tx.run(query, params)
+            return await result.consume()
+        
+        try:
+            return await session.execute_write(work)
+        finally:
+            self._idle_sessions.append(session)
     
-    def update_sync_timestamp(self, sync_type: str):
+    async def update_sync_timestamp(self, sync_type: str, session):
         """Update the sync timestamp for a specific type."""
         timestamp = datetime.now().isoformat()
         
-        with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-            session.run(
-                f"""
-                MERGE (m:Metadata {{key: 'last_{sync_type}_sync'}})
-                SET m.timestamp = $timestamp
-                """,
-                {"timestamp": timestamp}
-            )
-            
+        result = await session.run(SYNC_TIMESTAMP_CQL, {"key": f"last_{sync_type}_sync", "timestamp": timestamp})
+        await result.consume()
+        
         logger.info(f"Updated {sync_type} sync timestamp to {timestamp}")
     
-    def get_node_count(self) -> Tuple[int, int]:
+    async def get_node_count(self, session) -> Tuple[int, int]:
         """Get current node and relationship counts from Memgraph."""
-        with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-            result = session.run("MATCH (u:User) RETURN count(u) as user_count")
-            user_count = result.single()["user_count"]
-            
-            result = session.run("MATCH ()-[r:FOLLOWS]->() RETURN count(r) as follow_count")
-            follow_count = result.single()["follow_count"]
+        result = await session.run("MATCH (u:User) RETURN count(u) as user_count")
+        user_count = (await result.single())["user_count"]
+        
+        result = await session.run("MATCH ()-[r:FOLLOWS]->() RETURN count(r) as follow_count")
+        follow_count = (await result.single())["follow_count"]
+        
+        return user_count, follow_count
+    
+    async def _count_rows(self, table: str, params: Dict[str, str]) -> int:
+        """Count the rows of a Supabase table or view matching the filters."""
+        response = await self.http.head(
+            f"/{table}",
+            params=params,
+            headers={'Prefer': 'count=exact'}
+        )
+        response.raise_for_status()
+        
+        # PostgREST reports the total in the Content-Range header, e.g. "0-999/1234"
+        total = response.headers.get('content-range', '*/0').rsplit('/', 1)[-1]
+        return int(total) if total.isdigit() else 0
+    
+    @staticmethod
+    def _keyset_filter(columns: List[str], values: List[Any]) -> str:
+        """
+        Build a PostgREST filter for rows sorting after the given key.
+        
+        For columns (a, b) and values (x, y) this is
+        ``a.gt."x",and(a.eq."x",b.gt."y")``, to be wrapped in ``or(...)``.
+        """
+        terms = []
+        for i, column in enumerate(columns):
+            conditions = [f'{c}.eq."{v}"' for c, v in zip(columns[:i], values[:i])]
+            conditions.append(f'{column}.gt."{values[i]}"')
+            terms.append(conditions[0] if len(conditions) == 1 else f"and({','.join(conditions)})")
+        
+        return ','.join(terms)
+    
+    async def _get(self, path: str, params: Dict[str, Any]) -> httpx.Response:
+        """
+        GET a PostgREST resource, backing off when Supabase rate limits us.
+        
+        A 429 is retried with exponential backoff, honouring Retry-After
+        when the server sends it; any other error is raised.
+        """
+        for attempt in range(self.max_retries):
+            response = await self.http.get(path, params=params)
+            if response.status_code != 429 or attempt == self.max_retries - 1:
+                break
+            
+            retry_after = response.headers.get('retry-after', '')
+            delay = float(retry_after) if retry_after.isdigit() else 2 ** attempt
+            logger.warning(f"Rate limited by Supabase, retrying in {delay:.0f}s")
+            await asyncio.sleep(delay)
+        
+        response.raise_for_status()
+        return response
+    
+    async def _fetch_pages(self, table: str, key_columns: List[str], filters: Optional[Dict[str, str]] = None):
+        """
+        Page through a Supabase table or view using keyset pagination.
+        
+        Each page continues after the last row of the previous page in
+        key_columns order, so every request is an index range scan instead
+        of an OFFSET that re-reads all earlier rows.
+        
+        Args:
+            table: Table or view name
+            key_columns: Columns that uniquely identify and order a row
+            filters: PostgREST filter parameters
+        
+        Yields:
+            list: Rows of each non-empty page
+        """
+        cursor = None
+        
+        while True:
+            params = {**(filters or {}), 'select': '*', 'order': ','.join(key_columns), 'limit': self.page_size}
+            if cursor:
+                params['or'] = f"({self._keyset_filter(key_columns, cursor)})"
+            
+            response = await self._get(f"/{table}", params)
+            # orjson decodes straight from the response bytes, without the
+            # intermediate str and at several times the stdlib's speed
+            page = orjson.loads(response.content)
+            logger.info(f"Fetched {len(page)} rows from {table}")
+            
+            # A short page means we've reached the end
+            has_more = len(page) == self.page_size
+            if has_more:
+                cursor = [page[-1][column] for column in key_columns]
+            
+            if page:
+                yield page
+            
+            if not has_more:
+                break
+    
+    @staticmethod
+    def _row_hash(*values) -> int:
+        """Hash property values into a signed 64-bit int Memgraph can store."""
+        digest = hashlib.blake2b('|'.join(str(v) for v in values).encode(), digest_size=8).digest()
+        return int.from_bytes(digest, 'big', signed=True)
+    
+    def _shard(self, rows: List[Dict[str, Any]], key: str) -> List[List[Dict[str, Any]]]:
+        """Split rows into write_workers shards by the hash of a key column."""
+        shards = [[] for _ in range(self.write_workers)]
+        for row in rows:
+            shards[hash(row[key]) % self.write_workers].append(row)
+        
+        return [shard for shard in shards if shard]
+    
+    def _tune_batch_size(self, rows: List[Dict[str, Any]]):
+        """Size write batches so each UNWIND payload is about max_batch_bytes."""
+        sample = rows[:100]
+        bytes_per_row = max(1, len(orjson.dumps(sample, default=str)) // len(sample))
+        self.batch_size = max(500, min(50_000, self.max_batch_bytes // bytes_per_row))
+        logger.info(f"Using Memgraph batches of {self.batch_size} rows (~{bytes_per_row} bytes/row)")
+    
+    async def _rebatch(self, pages):
+        """
+        Regroup Supabase pages into Memgraph write batches.
+        
+        The batch size is tuned from the first page so each UNWIND carries
+        roughly max_batch_bytes, within 500 to 50,000 rows.
+        
+        Args:
+            pages: Async iterator of pages
+        
+        Yields:
+            list: Up to batch_size rows
+        """
+        buffer = []
+        tuned = False
+        
+        async for page in pages:
+            if not tuned:
+                self._tune_batch_size(page)
+                tuned = True
+            
+            buffer.extend(page)
+            if len(buffer) >= self.batch_size:
+                yield buffer
+                buffer = []
+        
+        if buffer:
+            yield buffer
+    
+    async def _prefetch(self, pages):
+        """
+        Fetch pages in a background task while the caller writes them.
+        
+        Up to prefetch_pages pages are buffered, so the Supabase request for
+        the next page overlaps the Memgraph write of the current one.
+        
+        Args:
+            pages: Async iterator of pages
+        
+        Yields:
+            list: The pages, in order
+        """
+        buffer = asyncio.Queue(maxsize=self.prefetch_pages)
+        
+        async def produce():
+            # The end sentinel is only sent on exhaustion or error. When the
+            # consumer cancels us it has stopped reading, and a put into a
+            # full buffer would block forever
+            try:
+                async for page in pages:
+                    await buffer.put(page)
+            except Exception:
+                await buffer.put(None)
+                raise
+            await buffer.put(None)
+        
+        producer = asyncio.create_task(produce())
+        
+        try:
+            while (page := await buffer.get()) is not None:
+                yield page
             
-            return user_count, follow_count
+            # Surface any error raised while fetching
+            await producer
+        finally:
+            producer.cancel()
     
-    def migrate_accounts(self):
-        """Migrate user accounts from Supabase to Memgraph."""
+    async def migrate_accounts(self) -> bool:
+        """Migrate user accounts from Supabase to Memgraph, returning whether it succeeded."""
         logger.info("Starting account migration")
-        initial_count, _ = self.get_node_count()
-        logger.info(f"Starting with {initial_count} user nodes")
+        
+        # One session for the counts of the whole phase
+        session = self._session()
         
         try:
+            initial_count, _ = await self.get_node_count(session)
+            logger.info(f"Starting with {initial_count} user nodes")
+            
             # Get total number of accounts for progress tracking
-            count_query = self.supabase.table('bluesky_accounts').select('count', count='exact')
-            count_response = count_query.execute()
-            total_expected = count_response.count
+            total_expected = await self._count_rows('bluesky_accounts', {})
             logger.info(f"Found {total_expected} total accounts to migrate")
             
-            # Process accounts in batches
-            total_accounts = 0
-            offset = 0
-            has_more = True
-            total_batches_processed = 0
-            
-            while has_more:
+            if self.force_full_sync and initial_count == 0 and self.csv_export_dir:
+                # Nothing to merge into, so load every account in one query
+                total_accounts = await self.bulk_load_accounts_csv(session)
+            else:
+                # Process accounts in batches
+                total_accounts = 0
+                total_written = 0
+                total_batches_processed = 0
                 start_time = time.time()
                 
-                # Fetch a batch of accounts with pagination
-                query = self.supabase.table('bluesky_accounts').select('*').range(offset, offset + self.batch_size - 1)
-                response = query.execute()
-                accounts_batch = response.data
-                batch_size = len(accounts_batch)
-                
-                logger.info(f"Fetched {batch_size} accounts (offset: {offset})")
-                total_accounts += batch_size
-                
-                # Process this batch
-                if batch_size > 0:
-                    processed = self._process_accounts_batch(accounts_batch)
+                account_pages = self._prefetch(self._fetch_pages('bluesky_accounts', ['did']))
+                async for accounts_batch in self._rebatch(account_pages):
+                    total_accounts += len(accounts_batch)
+                    
+                    # Process this batch
+                    processed = await self._process_accounts_batch(accounts_batch)
                     total_batches_processed += 1
                     
                     # Logging for monitoring progress
                     elapsed = time.time() - start_time
-                    current_count, _ = self.get_node_count()
-                    logger.info(f"Batch {total_batches_processed}: {processed} accounts processed in {elapsed:.2f}s. Total nodes: {current_count}")
+                    total_written += processed
+                    logger.info(f"Batch {total_batches_processed}: {processed} accounts processed in {elapsed:.2f}s. Total written: {total_written}")
                     
                     # Calculate progress percentage
                     progress = (total_accounts / total_expected) * 100 if total_expected > 0 else 0
                     logger.info(f"Progress: {progress:.1f}% ({total_accounts}/{total_expected})")
-                
-                # Check if there are more accounts to fetch
-                has_more = batch_size == self.batch_size
-                offset += self.batch_size
-                
-                # Add a small delay to avoid overwhelming the Supabase API
-                if has_more:
-                    time.sleep(0.2)
+                    start_time = time.time()
+                    
+                    # Release the batch before waiting on the next one, and collect
+                    # reference cycles now and then so long runs don't creep
+                    del accounts_batch
+                    if total_batches_processed % self.gc_interval == 0:
+                        gc.collect()
             
             # Final count check
-            final_count, _ = self.get_node_count()
+            final_count, _ = await self.get_node_count(session)
             logger.info(f"Completed migration of {total_accounts} accounts. Nodes before: {initial_count}, after: {final_count}")
             
-            # Update the sync timestamp
-            self.update_sync_timestamp("accounts")
-            
+            return True
+        
         except Exception as e:
-            logger.error(f"Error migrating accounts: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception(f"Error migrating accounts: {e}")
+            return False
+        finally:
+            await session.close()
+    
+    async def bulk_load_accounts_csv(self, session) -> int:
+        """
+        Load all accounts into an empty graph through LOAD CSV.
+        
+        The accounts are written to a gzipped CSV file in a directory
+        Memgraph can read, which Memgraph then loads in a single query,
+        without per-batch Bolt round-trips. Supabase caps every response at
+        page_size rows, so the file is built from the keyset pages rather
+        than requested from PostgREST as CSV.
+        
+        Args:
+            session: Memgraph session to run the load in
+            
+        Returns:
+            int: Number of accounts loaded
+        """
+        filename = "accounts.csv.gz"
+        total_accounts = 0
+        
+        with gzip.open(os.path.join(self.csv_export_dir, filename), "wt", newline="") as f:
+            writer = None
+            async for page in self._prefetch(self._fetch_pages('bluesky_accounts', ['did'])):
+                rows = [self._prepare_account(account) for account in page]
+                if writer is None:
+                    writer = csv.DictWriter(f, fieldnames=list(rows[0]))
+                    writer.writeheader()
+                writer.writerows(rows)
+                total_accounts += len(rows)
+        
+        logger.info(f"Exported {total_accounts} accounts to {filename}")
+        if not total_accounts:
+            return 0
+        
+        path = f"{self.csv_import_path.rstrip('/')}/{filename}"
+        result = await session.run(ACCOUNTS_LOAD_CSV_CQL.format(path=path))
+        summary = await result.consume()
+        
+        logger.info(f"Loaded {summary.counters.nodes_created} accounts through LOAD CSV")
+        return total_accounts
+    
+    def _prepare_account(self, account: Dict[str, Any]) -> Dict[str, Any]:
+        """Map a Supabase account row to the properties of its User node."""
+        handle = account.get('handle')
+        display_name = account.get('display_name') or ''
+        bio = account.get('bio') or ''
+        avatar_url = account.get('avatar_url') or ''
+        
+        return {
+            'did': account.get('did'),
+            'handle': handle,
+            'display_name': display_name,
+            'bio': bio,
+            'avatar_url': avatar_url,
+            'updated_at': account.get('last_updated_at'),
+            # Lets Memgraph skip the writes for unchanged profiles
+            'h': self._row_hash(handle, display_name, bio, avatar_url)
+        }
     
-    def _process_accounts_batch(self, accounts):
+    async def _process_accounts_batch(self, accounts):
         """Process a batch of accounts and update Memgraph."""
         if not accounts:
             return 0
             
-        batch_accounts = []
-        
         # Prepare batch data
-        for account in accounts:
-            batch_accounts.append({
-                'did': account.get('did'),
-                'handle': account.get('handle'),
-                'display_name': account.get('display_name') or '',
-                'bio': account.get('bio') or '',
-                'avatar_url': account.get('avatar_url') or '',
-                'updated_at': account.get('last_updated_at')
-            })
+        batch_accounts = [self._prepare_account(account) for account in accounts]
+        
+        # Write disjoint shards of the batch over concurrent sessions
+        results = await asyncio.gather(*(self._write_accounts(shard) for shard in self._shard(batch_accounts, 'did')))
+        return sum(results)
+    
+    async def _write_accounts(self, batch_accounts):
+        """Write a shard of prepared accounts to Memgraph."""
+        # Send one list per property rather than one map per account, so
+        # the property names aren't repeated on every row
+        columns = {key: [account[key] for account in batch_accounts] for key in batch_accounts[0]}
         
         # Update Memgraph with batched user creation
         try:
-            with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-                result = session.run(
-                    """
-                    UNWIND $accounts AS account
-                    MERGE (u:User {did: account.did})
-                    SET u.handle = account.handle,
-                        u.display_name = account.display_name,
-                        u.bio = account.bio,
-                        u.avatar_url = account.avatar_url,
-                        u.updated_at = account.updated_at
-                    RETURN count(*) as updated
-                    """,
-                    {"accounts": batch_accounts}
-                )
-                
-                updated = result.single()["updated"]
-                logger.info(f"Updated {updated} accounts in Memgraph")
-                return updated
+            summary = await self._write(ACCOUNTS_UPSERT_CQL, columns)
+            
+            logger.info(f"Updated {len(batch_accounts)} accounts in Memgraph ({summary.counters.nodes_created} new, {summary.counters.properties_set} properties set)")
+            return len(batch_accounts)
         except Exception as e:
+            # Fail the phase, so its sync timestamp isn't recorded
             logger.error(f"Error processing accounts batch: {e}")
             logger.error(f"First account in batch: {batch_accounts[0] if batch_accounts else 'None'}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return 0
+            raise
     
-    def migrate_follows(self):
-        """Migrate follow relationships from Supabase to Memgraph."""
+    async def migrate_follows(self) -> bool:
+        """Migrate follow relationships from Supabase to Memgraph, returning whether it succeeded."""
         logger.info("Starting follows migration")
-        _, initial_follows = self.get_node_count()
-        logger.info(f"Starting with {initial_follows} follow relationships")
+        
+        # One session for the counts of the whole phase
+        session = self._session()
         
         try:
-            # Create an efficient in-memory tracking set for existing users
-            user_dids = set()
-            with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-                result = session.run("MATCH (u:User) RETURN collect(u.did) as dids")
-                dids_from_db = result.single()["dids"]
-                user_dids.update(dids_from_db)
-                logger.info(f"Found {len(user_dids)} existing users in Memgraph")
+            _, initial_follows = await self.get_node_count(session)
+            logger.info(f"Starting with {initial_follows} follow relationships")
             
             # Get total number of follows for progress tracking
-            count_query = self.supabase.from_('follow_activity').select('count', count='exact').eq('follow_status', 'active')
-            count_response = count_query.execute()
-            total_expected = count_response.count
+            filters = {'follow_status': 'eq.active'}
+            total_expected = await self._count_rows('follow_activity', filters)
             logger.info(f"Found {total_expected} total active follows to migrate")
             
             # Process follows in batches
             total_follows = 0
-            offset = 0
-            has_more = True
+            total_written = 0
             total_batches_processed = 0
+            start_time = time.time()
             
-            while has_more:
-                start_time = time.time()
+            # Keyset order is follower first, so every batch arrives sorted by
+            # source vertex and its edges are written one follower at a time
+            follow_pages = self._fetch_pages('follow_activity', ['follower_did', 'following_did'], filters)
+            async for follows_batch in self._rebatch(self._prefetch(follow_pages)):
+                total_follows += len(follows_batch)
                 
-                # Fetch a batch of follows from the view
-                query = self.supabase.from_('follow_activity').select('*').eq('follow_status', 'active').range(offset, offset + self.batch_size - 1)
-                response = query.execute()
-                follows_batch = response.data
-                batch_size = len(follows_batch)
+                # Create any users the follows reference, then the relationships
+                processed = await self._process_follow_batch(follows_batch)
+                total_batches_processed += 1
                 
-                logger.info(f"Fetched {batch_size} follow activities (offset: {offset})")
-                total_follows += batch_size
+                # Logging for monitoring progress
+                elapsed = time.time() - start_time
+                total_written += processed
+                logger.info(f"Batch {total_batches_processed}: {processed} follows processed in {elapsed:.2f}s. Total written: {total_written}")
                 
-                # Process this batch
-                if batch_size > 0:
-                    # First ensure all users exist
-                    missing_users = self._ensure_users_exist(follows_batch, user_dids)
-                    # Then create the relationships
-                    processed = self._process_follow_batch(follows_batch)
-                    total_batches_processed += 1
-                    
-                    # Logging for monitoring progress
-                    elapsed = time.time() - start_time
-                    _, current_follows = self.get_node_count()
-                    logger.info(f"Batch {total_batches_processed}: Created {missing_users} missing users, {processed} follows processed in {elapsed:.2f}s. Total relationships: {current_follows}")
-                    
-                    # Calculate progress percentage
-                    progress = (total_follows / total_expected) * 100 if total_expected > 0 else 0
-                    logger.info(f"Progress: {progress:.1f}% ({total_follows}/{total_expected})")
-                
-                # Check if there are more follows to fetch
-                has_more = batch_size == self.batch_size
-                offset += self.batch_size
+                # Calculate progress percentage
+                progress = (total_follows / total_expected) * 100 if total_expected > 0 else 0
+                logger.info(f"Progress: {progress:.1f}% ({total_follows}/{total_expected})")
+                start_time = time.time()
                 
-                # Add a small delay to avoid overwhelming the Supabase API
-                if has_more:
-                    time.sleep(0.2)
+                # Release the batch before waiting on the next one, and collect
+                # reference cycles now and then so long runs don't creep
+                del follows_batch
+                if total_batches_processed % self.gc_interval == 0:
+                    gc.collect()
             
             # Final count check
-            _, final_follows = self.get_node_count()
+            _, final_follows = await self.get_node_count(session)
             logger.info(f"Completed migration of {total_follows} follows. Relationships before: {initial_follows}, after: {final_follows}")
             
-            # Update the sync timestamp
-            self.update_sync_timestamp("follows")
-            
+            return True
+        
         except Exception as e:
-            logger.error(f"Error migrating follows: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
-    
-    def _ensure_users_exist(self, follows, existing_dids):
-        """Ensure all users from the follows batch exist in Memgraph."""
-        # Extract user information
-        users_to_create = []
-        for follow in follows:
-            # Extract follower
-            follower_did = follow.get('follower_did')
-            if follower_did and follower_did not in existing_dids:
-                users_to_create.append({
-                    'did': follower_did,
-                    'handle': follow.get('follower_handle')
-                })
-                existing_dids.add(follower_did)
-            
-            # Extract following
-            following_did = follow.get('following_did')
-            if following_did and following_did not in existing_dids:
-                users_to_create.append({
-                    'did': following_did,
-                    'handle': follow.get('following_handle')
-                })
-                existing_dids.add(following_did)
-        
-        # Create any missing users
-        if users_to_create:
-            logger.info(f"Creating {len(users_to_create)} missing users")
-            
-            try:
-                with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-                    result = session.run(
-                        """
-                        UNWIND $users AS user
-                        MERGE (u:User {did: user.did})
-                        SET u.handle = user.handle
-                        RETURN count(*) as created
-                        """,
-                        {"users": users_to_create}
-                    )
-                    created = result.single()["created"]
-                    return created
-            except Exception as e:
-                logger.error(f"Error creating missing users: {e}")
-                import traceback
-                logger.error(traceback.format_exc())
-                return 0
-        
-        return 0
+            logger.exception(f"Error migrating follows: {e}")
+            return False
+        finally:
+            await session.close()
     
-    def _process_follow_batch(self, follows):
+    async def _process_follow_batch(self, follows):
         """Process a batch of follow relationships and update Memgraph."""
         if not follows:
             return 0
@@ -401,76 +661,96 @@ class SupabaseToMemgraph:
             
             active_follows.append(follow_data)
         
+        # Create any users the follows reference before the shards run, since
+        # every shard may point at the same followed users
+        users = {}
+        for follow in active_follows:
+            users.setdefault(follow['follower_did'], follow['follower_handle'])
+            users.setdefault(follow['following_did'], follow['following_handle'])
+        
+        summary = await self._write(
+            FOLLOW_USERS_MERGE_CQL,
+            {"users": [{'did': did, 'handle': handle} for did, handle in users.items()]}
+        )
+        logger.info(f"Merged {len(users)} follow endpoints ({summary.counters.nodes_created} new users)")
+        
+        # Shard by follower so concurrent sessions don't write to the same
+        # follower's relationships; shards keep the batch's follower order
+        results = await asyncio.gather(*(self._write_follows(shard) for shard in self._shard(active_follows, 'follower_did')))
+        return sum(results)
+    
+    async def _write_follows(self, active_follows):
+        """Write a shard of prepared follows to Memgraph."""
         # Process active follows
         try:
-            with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-                result = session.run(
-                    """
-                    UNWIND $follows AS follow
-                    MATCH (follower:User {did: follow.follower_did})
-                    MATCH (following:User {did: follow.following_did})
-                    MERGE (follower)-[r:FOLLOWS]->(following)
-                    SET r.created_at = follow.created_at,
-                        r.last_verified_at = follow.last_verified_at,
-                        r.activity_type = follow.activity_type,
-                        r.follower_handle = follow.follower_handle,
-                        r.following_handle = follow.following_handle
-                    RETURN count(*) as updated
-                    """,
-                    {"follows": active_follows}
-                )
-                
-                updated = result.single()["updated"]
-                logger.info(f"Updated {updated} active follows in Memgraph")
-                return updated
+            summary = await self._write(FOLLOWS_UPSERT_CQL, {"follows": active_follows})
+            
+            logger.info(f"Updated {len(active_follows)} active follows in Memgraph ({summary.counters.relationships_created} new)")
+            return len(active_follows)
         except Exception as e:
+            # Fail the phase, so its sync timestamp isn't recorded
             logger.error(f"Error processing active follows: {e}")
             logger.error(f"First follow in batch: {active_follows[0] if active_follows else 'None'}")
-            import traceback
-            logger.error(traceback.format_exc())
-            return 0
+            raise
     
-    def run(self):
+    async def run(self):
         """Run the migration process."""
         try:
             start_time = time.time()
             logger.info("Starting Supabase to Memgraph migration")
             
             if self.force_full_sync:
-                self.reset_sync_timestamps()
+                await self.reset_sync_timestamps()
             
-            # Set up schema
-            self.setup_schema()
+            # Set up the constraints; indexes are created after the bulk load
+            await self.setup_constraints()
             
             # Switch to analytical mode for better import performance
-            with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-                session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
+            async with self._session() as session:
+                await session.run("STORAGE MODE IN_MEMORY_ANALYTICAL")
             
             # First migrate all user accounts
             account_sync_start = time.time()
-            self.migrate_accounts()
+            accounts_migrated = await self.migrate_accounts()
             account_sync_time = time.time() - account_sync_start
             logger.info(f"Account migration completed in {account_sync_time:.2f} seconds")
             
             # Then migrate all follow relationships
             follow_sync_start = time.time()
-            self.migrate_follows()
+            follows_migrated = await self.migrate_follows()
             follow_sync_time = time.time() - follow_sync_start
             logger.info(f"Follow migration completed in {follow_sync_time:.2f} seconds")
             
-            # Switch back to transactional mode
-            with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-                session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
+            # Index the loaded data
+            await self.create_indexes()
             
-            # Print some stats
-            with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
+            async with self._session() as session:
+                # Switch back to transactional mode
+                await session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
+                
+                # Record the phases that completed
+                if accounts_migrated:
+                    await self.update_sync_timestamp("accounts", session)
+                if follows_migrated:
+                    await self.update_sync_timestamp("follows", session)
+                
+                # Analytical mode writes no WAL, so persist the import in one
+                # snapshot rather than waiting for the next periodic one
+                try:
+                    result = await session.run("CREATE SNAPSHOT")
+                    await result.consume()
+                    logger.info("Created snapshot of the migrated data")
+                except Exception as e:
+                    logger.warning(f"Error creating snapshot: {e}")
+                
+                # Print some stats
                 # Count users
-                result = session.run("MATCH (u:User) RETURN count(u) as count")
-                user_count = result.single()["count"]
+                result = await session.run("MATCH (u:User) RETURN count(u) as count")
+                user_count = (await result.single())["count"]
                 
                 # Count follow relationships
-                result = session.run("MATCH ()-[r:FOLLOWS]->() RETURN count(r) as count")
-                follow_count = result.single()["count"]
+                result = await session.run("MATCH ()-[r:FOLLOWS]->() RETURN count(r) as count")
+                follow_count = (await result.single())["count"]
                 
                 # Total execution time
                 total_time = time.time() - start_time
@@ -478,26 +758,28 @@ class SupabaseToMemgraph:
                 logger.info(f"Migration completed in {total_time:.2f} seconds: {user_count} users, {follow_count} follow relationships")
             
         except Exception as e:
-            logger.error(f"Error during migration: {e}")
-            import traceback
-            logger.error(traceback.format_exc())
+            logger.exception(f"Error during migration: {e}")
         
         finally:
             # Make sure we're back in transactional mode
             try:
-                with self.driver.session(database="", max_transaction_retry_time=self.timeout) as session:
-                    session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
+                async with self._session() as session:
+                    await session.run("STORAGE MODE IN_MEMORY_TRANSACTIONAL")
             except:
                 pass
 
-def main():
-    """Main entry point."""
+async def run_migration():
+    """Run one full migration and close the connections."""
     migrator = SupabaseToMemgraph(force_full_sync=True)
     
     try:
-        migrator.run()
+        await migrator.run()
     finally:
-        migrator.close()
+        await migrator.close()
+
+def main():
+    """Main entry point."""
+    asyncio.run(run_migration())
 
 if __name__ == "__main__":
     main()
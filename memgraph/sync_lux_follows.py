@@ -8,8 +8,9 @@ lux.bsky.social that weren't properly created in the main sync.
 
 import os
 import sys
-import time
+import queue
 import logging
+import threading
 from datetime import datetime
 
 import neo4j
@@ -31,6 +32,49 @@ logging.basicConfig(
 )
 logger = logging.getLogger("LuxFollowsSync")
 
+# Columns fetched from Supabase, only those written to Memgraph
+ACCOUNT_SELECT = "did,handle,display_name,bio,avatar_url,last_updated_at"
+FOLLOWS_SELECT = ("follower_did,following_did,follower_handle,following_handle,"
+                  "created_at,last_verified_at,activity_type")
+
+# Memgraph queries. Only the parameters change between calls, so Memgraph
+# can reuse the cached plan for each of them.
+LUX_UPSERT_CQL = """
+    MERGE (lux:User {did: $did})
+    SET lux.handle = $handle,
+        lux.display_name = $display_name,
+        lux.bio = $bio,
+        lux.avatar_url = $avatar_url,
+        lux.updated_at = $updated_at
+"""
+
+USERS_UPSERT_CQL = """
+    UNWIND $users AS u
+    MERGE (user:User {did: u.did})
+    SET user.handle = u.handle
+"""
+
+FOLLOWS_UPSERT_CQL = """
+    UNWIND $rels AS f
+    MATCH (a:User {did: f.src})
+    MATCH (b:User {did: f.dst})
+    MERGE (a)-[r:FOLLOWS]->(b)
+    SET r.created_at = f.created_at,
+        r.last_verified_at = f.last_verified_at,
+        r.activity_type = f.activity_type
+    RETURN count(*) as created
+"""
+
+FOLLOWER_COUNT_CQL = """
+    MATCH (lux:User {did: $lux_did})<-[:FOLLOWS]-(follower:User)
+    RETURN count(follower) as follower_count
+"""
+
+FOLLOWING_COUNT_CQL = """
+    MATCH (lux:User {did: $lux_did})-[:FOLLOWS]->(following:User)
+    RETURN count(following) as following_count
+"""
+
 class LuxFollowsSync:
     """Sync Lux's follow relationships to Memgraph."""
     
@@ -64,9 +108,12 @@ class LuxFollowsSync:
             sys.exit(1)
         
         # Configuration
-        self.batch_size = 100
+        self.batch_size = 1000  # Rows per Supabase page and Memgraph write
+        self.prefetch_pages = 4  # Pages fetched ahead of the Memgraph writes
+        self.batches_per_transaction = 5  # Batches committed together
         self.lux_did = "did:plc:hhtah7oh3r4vq3jrn5iuy7hm"
         self.lux_handle = "lux.bsky.social"
+        self._merged_dids = set()  # Users already merged during this sync
     
     def close(self):
         """Close connections."""
@@ -78,10 +125,10 @@ class LuxFollowsSync:
         logger.info(f"Starting sync for {self.lux_handle} follow relationships")
         
         try:
-            # First, ensure Lux's node exists
+            # One session for the whole sync, rather than one per batch
             with self.driver.session() as session:
                 # Get Lux's account data
-                lux_query = self.supabase.table('bluesky_accounts').select('*').eq('did', self.lux_did)
+                lux_query = self.supabase.table('bluesky_accounts').select(ACCOUNT_SELECT).eq('did', self.lux_did)
                 lux_response = lux_query.execute()
                 
                 if not lux_response.data:
@@ -92,14 +139,7 @@ class LuxFollowsSync:
                 
                 # Ensure Lux's node exists
                 session.run(
-                    """
-                    MERGE (lux:User {did: $did})
-                    SET lux.handle = $handle,
-                        lux.display_name = $display_name,
-                        lux.bio = $bio,
-                        lux.avatar_url = $avatar_url,
-                        lux.updated_at = $updated_at
-                    """,
+                    LUX_UPSERT_CQL,
                     {
                         'did': lux_account.get('did'),
                         'handle': lux_account.get('handle'),
@@ -108,110 +148,200 @@ class LuxFollowsSync:
                         'avatar_url': lux_account.get('avatar_url') or '',
                         'updated_at': lux_account.get('last_updated_at')
                     }
-                )
+                ).consume()
                 logger.info(f"Ensured {self.lux_handle} node exists")
-            
-            # Get all of Lux's follows
-            follows_query = self.supabase.from_('follow_activity').select('*') \
-                .or_(f"follower_did.eq.{self.lux_did},following_did.eq.{self.lux_did}") \
-                .eq('follow_status', 'active')
-            follows_response = follows_query.execute()
-            follows = follows_response.data
-            
-            logger.info(f"Found {len(follows)} active follow relationships for {self.lux_handle}")
-            
-            # Process in batches
-            for i in range(0, len(follows), self.batch_size):
-                batch = follows[i:i+self.batch_size]
-                self._process_follow_batch(batch)
-                logger.info(f"Processed batch {i//self.batch_size + 1}/{(len(follows) + self.batch_size - 1)//self.batch_size}")
-                time.sleep(0.1)
-            
-            # Check results
-            with self.driver.session() as session:
-                result = session.run(
-                    f"""
-                    MATCH (lux:User {{did: '{self.lux_did}'}})
-                    MATCH (lux)<-[r1:FOLLOWS]-(follower:User)
-                    MATCH (lux)-[r2:FOLLOWS]->(following:User)
-                    RETURN count(DISTINCT follower) as follower_count, 
-                           count(DISTINCT following) as following_count
-                    """
-                )
-                counts = result.single()
-                logger.info(f"Successfully synced: {counts['follower_count']} followers, {counts['following_count']} following")
+                self._merged_dids = {self.lux_did}
+                
+                # Write each page of Lux's follows while the next is fetched,
+                # committing batches_per_transaction pages at a time
+                total_follows = 0
+                pending = []
+                for batch_number, batch in enumerate(self._prefetch(self._fetch_pages()), 1):
+                    pending.append(batch)
+                    total_follows += len(batch)
+                    
+                    if len(pending) == self.batches_per_transaction:
+                        self._process_follow_batches(session, pending)
+                        pending = []
+                        logger.info(f"Processed batch {batch_number} ({total_follows} follows so far)")
+                
+                if pending:
+                    self._process_follow_batches(session, pending)
+                
+                logger.info(f"Found {total_follows} active follow relationships for {self.lux_handle}")
+                
+                # Check results, counting each direction separately rather
+                # than over the followers x followings cross product
+                result = session.run(FOLLOWER_COUNT_CQL, {"lux_did": self.lux_did})
+                follower_count = result.single()["follower_count"]
+                
+                result = session.run(FOLLOWING_COUNT_CQL, {"lux_did": self.lux_did})
+                following_count = result.single()["following_count"]
+                
+                logger.info(f"Successfully synced: {follower_count} followers, {following_count} following")
             
         except Exception as e:
             logger.error(f"Error syncing {self.lux_handle} follows: {e}")
             import traceback
             logger.error(traceback.format_exc())
     
-    def _process_follow_batch(self, follows):
-        """Process a batch of follows and create relationships."""
-        # Create followers
-        outgoing_follows = []  # Lux follows these
-        incoming_follows = []  # These follow Lux
+    def _fetch_pages(self):
+        """
+        Page through Lux's active follows in Supabase using keyset pagination.
+        
+        Followers and followings are read separately, each ordered by the
+        other user's DID, so every page continues after the last DID of the
+        previous one instead of re-reading earlier rows with an OFFSET.
+        
+        Yields:
+            list: Follow rows of each non-empty page
+        """
+        for lux_column, other_column in (('following_did', 'follower_did'), ('follower_did', 'following_did')):
+            cursor = None
+            
+            while True:
+                follows_query = self.supabase.from_('follow_activity').select(FOLLOWS_SELECT) \
+                    .eq(lux_column, self.lux_did) \
+                    .eq('follow_status', 'active') \
+                    .order(other_column) \
+                    .limit(self.batch_size)
+                if cursor:
+                    follows_query = follows_query.gt(other_column, cursor)
+                page = follows_query.execute().data
+                
+                if page:
+                    yield page
+                
+                # A short page means we've reached the end
+                if len(page) < self.batch_size:
+                    break
+                cursor = page[-1][other_column]
+    
+    def _prefetch(self, pages):
+        """
+        Fetch pages on a background thread while the caller writes them.
+        
+        Up to prefetch_pages pages are buffered, so the Supabase request for
+        the next page overlaps the Memgraph write of the current one. The
+        Memgraph driver is only used from the calling thread.
+        
+        Args:
+            pages: Iterator of pages
+        
+        Yields:
+            list: The pages, in order
+        """
+        buffer = queue.Queue(maxsize=self.prefetch_pages)
+        done = object()
+        stop = threading.Event()
+        
+        def produce():
+            try:
+                for page in pages:
+                    if stop.is_set():
+                        return
+                    buffer.put(page)
+                buffer.put(done)
+            except Exception as e:
+                buffer.put(e)
+        
+        producer = threading.Thread(target=produce, daemon=True)
+        producer.start()
+        
+        try:
+            while (item := buffer.get()) is not done:
+                # Surface any error raised while fetching
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            # Unblock the producer if we stopped early, then wait for it
+            stop.set()
+            while producer.is_alive():
+                try:
+                    buffer.get(timeout=0.1)
+                except queue.Empty:
+                    pass
+            producer.join()
+    
+    def _process_follow_batches(self, session, batches):
+        """
+        Create the relationships of several batches of follows.
+        
+        All the batches are written in one transaction, so the commit is
+        paid once for the group rather than once per batch. Each user is
+        merged once per sync, ahead of the relationships, which then only
+        need to MATCH their endpoints.
+        
+        Args:
+            session: Memgraph session to write in
+            batches: Lists of follow rows
+        """
+        writes = []
+        new_dids = set()
+        
+        for relationships, handles in map(self._prepare_relationships, batches):
+            if not relationships:
+                continue
+            
+            users = [
+                {'did': did, 'handle': handle}
+                for did, handle in handles.items()
+                if did not in self._merged_dids and did not in new_dids
+            ]
+            new_dids.update(user['did'] for user in users)
+            writes.append((users, relationships))
+        
+        if not writes:
+            return
+        
+        def work(tx):
+            created = 0
+            for users, relationships in writes:
+                if users:
+                    tx.run(USERS_UPSERT_CQL, {"users": users}).consume()
+                
+                result = tx.run(FOLLOWS_UPSERT_CQL, {"rels": relationships})
+                created += result.single()["created"]
+            return created
+        
+        # Create relationships in Memgraph
+        created = session.execute_write(work)
+        logger.info(f"Created {created} follow relationships")
+        
+        # Only once committed, so a retried transaction merges them again
+        self._merged_dids.update(new_dids)
+    
+    def _prepare_relationships(self, follows):
+        """
+        Map follow rows to the relationships to create, dropping any not involving Lux.
+        
+        Returns:
+            tuple: Relationship parameters, and the handle of each DID they reference
+        """
+        # Both directions go in one list, so the batch is a single query
+        relationships = []
+        handles = {}
         
         for follow in follows:
             follower_did = follow.get('follower_did')
             following_did = follow.get('following_did')
             
-            if follower_did == self.lux_did:
-                # Lux follows someone
-                outgoing_follows.append({
-                    'did': following_did,
-                    'handle': follow.get('following_handle'),
-                    'created_at': follow.get('created_at'),
-                    'last_verified_at': follow.get('last_verified_at'),
-                    'activity_type': follow.get('activity_type')
-                })
-            elif following_did == self.lux_did:
-                # Someone follows Lux
-                incoming_follows.append({
-                    'did': follower_did,
-                    'handle': follow.get('follower_handle'),
-                    'created_at': follow.get('created_at'),
-                    'last_verified_at': follow.get('last_verified_at'),
-                    'activity_type': follow.get('activity_type')
-                })
-        
-        # Create relationships in Memgraph
-        with self.driver.session() as session:
-            if incoming_follows:
-                result = session.run(
-                    f"""
-                    UNWIND $followers AS f
-                    MERGE (follower:User {{did: f.did}})
-                    SET follower.handle = f.handle
-                    MERGE (lux:User {{did: '{self.lux_did}'}})
-                    MERGE (follower)-[r:FOLLOWS]->(lux)
-                    SET r.created_at = f.created_at,
-                        r.last_verified_at = f.last_verified_at,
-                        r.activity_type = f.activity_type
-                    RETURN count(*) as created
-                    """,
-                    {"followers": incoming_follows}
-                )
-                created = result.single()["created"]
-                logger.info(f"Created {created} incoming follow relationships")
+            # Only follows to or from Lux belong here
+            if self.lux_did not in (follower_did, following_did):
+                continue
             
-            if outgoing_follows:
-                result = session.run(
-                    f"""
-                    UNWIND $followings AS f
-                    MERGE (following:User {{did: f.did}})
-                    SET following.handle = f.handle
-                    MERGE (lux:User {{did: '{self.lux_did}'}})
-                    MERGE (lux)-[r:FOLLOWS]->(following)
-                    SET r.created_at = f.created_at,
-                        r.last_verified_at = f.last_verified_at,
-                        r.activity_type = f.activity_type
-                    RETURN count(*) as created
-                    """,
-                    {"followings": outgoing_follows}
-                )
-                created = result.single()["created"]
-                logger.info(f"Created {created} outgoing follow relationships")
+            relationships.append({
+                'src': follower_did,
+                'dst': following_did,
+                'created_at': follow.get('created_at'),
+                'last_verified_at': follow.get('last_verified_at'),
+                'activity_type': follow.get('activity_type')
+            })
+            handles[follower_did] = follow.get('follower_handle')
+            handles[following_did] = follow.get('following_handle')
+        
+        return relationships, handles
 
 def main():
     """Main entry point."""
@@ -0,0 +1,37 @@
+-- The upserts below resolve conflicts on these keys, which Postgres only
+-- accepts with a unique index or constraint on each. They are redundant where
+-- the keys are already primary keys or unique constraints.
+CREATE UNIQUE INDEX IF NOT EXISTS idx_bluesky_accounts_did ON bluesky_accounts (did);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_follows_follower_following ON follows (follower_did, following_did);
+
+-- Apply one crawl step (accounts + follow relationships) in a single call.
+-- Profile fields missing from a crawl keep their stored values.
+CREATE OR REPLACE FUNCTION crawl_apply(accounts JSONB, edges JSONB)
+RETURNS VOID
+LANGUAGE plpgsql
+AS $$
+BEGIN
+  INSERT INTO bluesky_accounts (did, handle, display_name, description, avatar_url)
+  SELECT a.did, a.handle, a.display_name, a.description, a.avatar_url
+  FROM jsonb_to_recordset(accounts) AS a(
+    did TEXT,
+    handle TEXT,
+    display_name TEXT,
+    description TEXT,
+    avatar_url TEXT
+  )
+  ON CONFLICT (did) DO UPDATE SET
+    handle = EXCLUDED.handle,
+    display_name = COALESCE(EXCLUDED.display_name, bluesky_accounts.display_name),
+    description = COALESCE(EXCLUDED.description, bluesky_accounts.description),
+    avatar_url = COALESCE(EXCLUDED.avatar_url, bluesky_accounts.avatar_url);
+
+  INSERT INTO follows (follower_did, following_did)
+  SELECT e.follower_did, e.following_did
+  FROM jsonb_to_recordset(edges) AS e(
+    follower_did TEXT,
+    following_did TEXT
+  )
+  ON CONFLICT (follower_did, following_did) DO NOTHING;
+END;
+$$;
@@ -0,0 +1,5 @@
+-- Track when each Memgraph sync last ran, next to the data it syncs
+CREATE TABLE IF NOT EXISTS sync_metadata (
+  key TEXT PRIMARY KEY,
+  last_sync TIMESTAMPTZ NOT NULL
+);
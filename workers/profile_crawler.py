@@ -55,12 +55,18 @@ class BlueskyAPIClient:
         self.rate_limit_reset = 0
         self.token_created_at = None
         self.token_expires_in = 3600  # Default token lifetime in seconds (1 hour)
+        # Set VERIFY_SSL=false to disable certificate checks (debugging only)
+        self.verify_ssl = os.getenv("VERIFY_SSL", "true").lower() != "false"
     
     async def initialize(self):
         """Initialize the API client session and authenticate if credentials are provided."""
         if self.session is None:
             # Create an SSL context using certifi's trusted certificates
             ssl_context = ssl.create_default_context(cafile=certifi.where())
+            if not self.verify_ssl:
+                ssl_context.check_hostname = False
+                ssl_context.verify_mode = ssl.CERT_NONE
+                logger.warning("SSL verification disabled. This is insecure and should only be used for debugging!")
             # Create a ClientSession with the SSL context
             connector = aiohttp.TCPConnector(ssl=ssl_context)
             self.session = aiohttp.ClientSession(connector=connector)